@@ -0,0 +1,232 @@
+#!/usr/local/bin/python3
+
+from argparse import ArgumentParser
+from json import dumps
+from os import makedirs, walk
+from os.path import abspath, dirname, getsize, join
+from random import Random
+from shutil import rmtree
+from subprocess import Popen, PIPE
+from sys import executable
+from tempfile import mkdtemp
+
+# Usage:
+# python3 benchmark-create-csv.py [--instances N] [--runs N] [--stats-kb KB] [--interrupted RATIO]
+#     [--mode "OPTIONS"]... [--repeat N] [--keep DIR]
+
+create_csv = join(dirname(abspath(__file__)), "create-csv.py")
+interrupt_banner = "*** Info : (clingo): INTERRUPTED by signal!\n"
+
+# runs a command and prints its wall clock time, peak resident memory (KB) and exit
+# code; started as a fresh process, because ru_maxrss includes the memory of the
+# process that started the command (e.g. the generated results of this script)
+measure_helper = """
+from os import wait4, waitstatus_to_exitcode
+from subprocess import Popen, DEVNULL
+from sys import argv
+from time import perf_counter
+
+start = perf_counter()
+process = Popen(argv[1:], stdout=DEVNULL)
+pid, status, usage = wait4(process.pid, 0)
+print(perf_counter() - start, usage.ru_maxrss, waitstatus_to_exitcode(status))
+"""
+
+def solver_output(generator, instance, horizon, stats_kb, interrupted):
+    """
+    Creates the content of a synthetic runsolver.solver file, i.e. clingo output
+    in JSON format as written with --outf=2 and --stats
+
+    Parameters
+    ----------
+    generator : Random
+        Source of the random timings and statistics
+    instance : int
+        The instance number
+    horizon : int
+        The horizon, used for the atoms of the witness
+    stats_kb : int
+        Approximate size of the statistics in kilobytes
+    interrupted : bool
+        Adds the banner clingo prints if it is interrupted
+
+    Returns
+    -------
+    str
+        The content of the file
+    """
+
+    total = generator.uniform(0.01, 300.0)
+    solve = total * generator.random()
+    solver = {
+        "Choices": generator.randrange(10**6),
+        "Conflicts": generator.randrange(10**5),
+        "Restarts": generator.randrange(10**3)
+    }
+    # one entry per thread and step makes the statistics grow like --stats=2 does
+    thread = ["Choices", "Conflicts", "Restarts", "Propagations", "Domain", "Integrated", "Lemmas", "Deleted"]
+    threads = [
+        dict((key, generator.randrange(10**6)) for key in thread)
+        for i in range(stats_kb * 1024 // len(dumps(dict((key, 10**6) for key in thread), indent=2)))
+    ]
+
+    output = dumps({
+        "Solver": "clingo version 5.4.0",
+        "Input": ["instance-%03d.lp" % instance, "encoding.lp"],
+        "Call": [{"Witnesses": [{"Value": [
+            "occurs(move(robot(%d),%d),%d)" % (i % 4, i % 3, t) for t in range(1, horizon + 1) for i in range(4)
+        ] + [
+            "holds(at(robot(%d),%d),%d)" % (i % 4, i, t) for t in range(horizon + 1) for i in range(4)
+        ]}]}],
+        "Result": "SATISFIABLE",
+        "Models": {"Number": 1, "More": "yes"},
+        "Calls": 1,
+        "Time": {"Total": total, "Solve": solve, "Model": solve / 2, "Unsat": 0.0, "CPU": total},
+        "Stats": {
+            "Problem": {"Lp": {"Atoms": generator.randrange(10**6), "Rules": generator.randrange(10**6)}},
+            "Solving": {"Solvers": solver},
+            "Accu": {"Threads": threads}
+        }
+    }, indent=2)
+
+    if interrupted:
+        output = output.replace('  "Result"', interrupt_banner + '  "Result"', 1)
+
+    return output
+
+def generate_results(path, instances, runs, stats_kb, interrupted, seed=0):
+    """
+    Creates a synthetic results folder with one directory per instance and one
+    runsolver.solver file per run
+
+    Parameters
+    ----------
+    path : str
+        The results folder
+    instances : int
+        Number of instance directories
+    runs : int
+        Number of runs per instance
+    stats_kb : int
+        Approximate size of the statistics per file in kilobytes
+    interrupted : float
+        Ratio of interrupted runs
+    seed : int, optional
+        Seed for the random timings (default is 0)
+    """
+
+    generator = Random(seed)
+
+    for instance in range(1, instances + 1):
+        horizon = 10 + instance % 20
+        # same naming scheme create-csv.py expects by default
+        instance_path = join(path, "%02d-instance-%03d.lp" % (horizon, instance % 1000))
+
+        for run in range(1, runs + 1):
+            run_path = join(instance_path, "run%d" % run)
+            makedirs(run_path)
+
+            with open(join(run_path, "runsolver.solver"), "w") as solver_file:
+                solver_file.write(solver_output(generator, instance, horizon, stats_kb, generator.random() < interrupted))
+
+def tree_size(path):
+    """
+    Returns the number of runsolver files and their size in bytes
+
+    Parameters
+    ----------
+    path : str
+        The results folder
+
+    Returns
+    -------
+    int, int
+        Number of files and total size
+    """
+
+    files = 0
+    size = 0
+
+    for root, dirs, names in walk(path):
+        for name in names:
+            if name == "runsolver.solver":
+                files += 1
+                size += getsize(join(root, name))
+
+    return files, size
+
+def run_create_csv(results_path, work_path, name, runs, options):
+    """
+    Runs create-csv.py once
+
+    Parameters
+    ----------
+    results_path : str
+        The results folder
+    work_path : str
+        Working directory the CSV (and cache) files are written to
+    name : str
+        Output name handed to create-csv.py
+    runs : int
+        Number of runs per instance
+    options : list
+        Additional command line options
+
+    Returns
+    -------
+    float, int
+        Wall clock time in seconds and peak resident memory of the largest
+        process in kilobytes
+    """
+
+    command = [executable, create_csv, results_path + "/", name, str(runs)] + options
+    process = Popen([executable, "-c", measure_helper] + command, cwd=work_path, stdout=PIPE)
+    seconds, peak, returncode = process.communicate()[0].split()
+
+    if int(returncode) != 0:
+        raise RuntimeError("create-csv.py %s failed with status %s" % (" ".join(options), returncode.decode()))
+
+    return float(seconds), int(peak)
+
+def main():
+    parser = ArgumentParser(description="Measures the throughput of create-csv.py on synthetic results")
+    parser.add_argument("--instances", type=int, default=200, help="number of instance directories (default is 200)")
+    parser.add_argument("--runs", type=int, default=10, help="number of runs per instance (default is 10)")
+    parser.add_argument("--stats-kb", type=int, default=64,
+        help="approximate size of the statistics per runsolver file in KB (default is 64)")
+    parser.add_argument("--interrupted", type=float, default=0.1, help="ratio of interrupted runs (default is 0.1)")
+    parser.add_argument("--mode", action="append", metavar="OPTIONS",
+        help="create-csv.py options to measure, can be given multiple times (default is \"\", \"--jobs 4\" and \"--cache\")")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode, the fastest is reported (default is 3)")
+    parser.add_argument("--keep", metavar="DIR", help="generate the results into DIR and keep them")
+    args = parser.parse_args()
+
+    modes = args.mode if args.mode is not None else ["", "--jobs 4", "--cache"]
+    work_path = mkdtemp(prefix="benchmark-create-csv-")
+    results_path = args.keep if args.keep is not None else join(work_path, "results")
+
+    try:
+        print("Generating %d instances x %d runs ..." % (args.instances, args.runs))
+        generate_results(results_path, args.instances, args.runs, args.stats_kb, args.interrupted)
+        files, size = tree_size(results_path)
+        print("... Done: %d files, %.1f MB\n" % (files, size / 2**20))
+
+        print("{:<30}{:>10}{:>12}{:>10}{:>12}".format("MODE", "TIME (s)", "FILES/s", "MB/s", "PEAK (MB)"))
+
+        for i, mode in enumerate(modes):
+            # the first run of a mode also warms up caches of the mode (e.g. --cache)
+            measurements = [
+                run_create_csv(results_path, work_path, "benchmark-%d" % i, args.runs, mode.split())
+                for repeat in range(args.repeat)
+            ]
+            seconds = min(seconds for seconds, peak in measurements)
+            peak = max(peak for seconds, peak in measurements)
+
+            print("{:<30}{:>10.3f}{:>12.0f}{:>10.1f}{:>12.1f}".format(
+                mode if mode != "" else "(default)", seconds, files / seconds, size / 2**20 / seconds, peak / 1024
+            ))
+    finally:
+        rmtree(work_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/local/bin/python3
+
+from argparse import ArgumentParser
+from importlib.util import module_from_spec, spec_from_file_location
+from io import StringIO
+from json import dumps
+from os.path import abspath, dirname, getsize, join
+from random import Random
+from shutil import rmtree
+from subprocess import Popen, PIPE
+from sys import executable
+from tempfile import mkdtemp
+from time import perf_counter
+
+# Usage:
+# python3 benchmark-pretty-print.py [--models N] [--horizon N] [--actions N] [--fluents N]
+#     [--change-ratio RATIO] [--mode "OPTIONS"]... [--repeat N] [--keep FILE]
+
+pretty_print = join(dirname(abspath(__file__)), "pretty-print.py")
+
+# runs a command and prints its wall clock time, peak resident memory (KB) and exit
+# code; started as a fresh process, because ru_maxrss includes the memory of the
+# process that started the command (e.g. the generated results of this script)
+measure_helper = """
+from os import wait4, waitstatus_to_exitcode
+from subprocess import Popen, DEVNULL
+from sys import argv
+from time import perf_counter
+
+start = perf_counter()
+process = Popen(argv[1:], stdout=DEVNULL)
+pid, status, usage = wait4(process.pid, 0)
+print(perf_counter() - start, usage.ru_maxrss, waitstatus_to_exitcode(status))
+"""
+
+def load_pretty_print():
+    """
+    Imports pretty-print.py, which cannot be imported by name because of the hyphen
+
+    Returns
+    -------
+    module
+        The pretty-print.py module
+    """
+
+    spec = spec_from_file_location("pretty_print", pretty_print)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+def witness(generator, horizon, actions, fluents, change_ratio):
+    """
+    Creates the atoms of a synthetic plan with nested terms. The fluents are
+    inertial, i.e. only some of them change from one timestep to the next
+
+    Parameters
+    ----------
+    generator : Random
+        Source of the random atoms
+    horizon : int
+        Number of timesteps with actions, fluents hold until horizon + 1
+    actions : int
+        Number of actions per timestep
+    fluents : int
+        Number of fluents per timestep
+    change_ratio : float
+        Ratio of fluents that change from one timestep to the next
+
+    Returns
+    -------
+    list
+        The atoms, e.g. ["occurs(move(robot(1),12),0)", "holds(at(robot(1),12),1)"]
+    """
+
+    atoms = [
+        "occurs(move(robot(%d),%d),%d)" % (generator.randrange(100), generator.randrange(100), t)
+        for t in range(horizon) for i in range(actions)
+    ]
+    positions = [generator.randrange(100) for i in range(fluents)]
+
+    for t in range(horizon + 1):
+        for i in range(fluents):
+            if generator.random() < change_ratio:
+                positions[i] = generator.randrange(100)
+
+            atoms.append("holds(at(robot(%d),%d),%d)" % (i, positions[i], t))
+
+    return atoms
+
+def generate_output(path, models, horizon, actions, fluents, change_ratio, seed=0):
+    """
+    Writes synthetic clingo output in JSON format (--outf=2), one witness at a time
+
+    Parameters
+    ----------
+    path : str
+        Destination file
+    models : int
+        Number of witnesses
+    horizon : int
+        Number of timesteps with actions
+    actions : int
+        Number of actions per timestep
+    fluents : int
+        Number of fluents per timestep
+    change_ratio : float
+        Ratio of fluents that change from one timestep to the next
+    seed : int, optional
+        Seed for the random atoms (default is 0)
+
+    Returns
+    -------
+    int
+        Number of atoms written
+    """
+
+    generator = Random(seed)
+    atoms = 0
+
+    with open(path, "w") as output_file:
+        output_file.write('{\n  "Solver": "clingo version 5.4.0",\n  "Input": [\n    "benchmark.lp"\n  ],\n')
+        output_file.write('  "Call": [\n    {\n      "Witnesses": [\n')
+
+        for model in range(models):
+            value = witness(generator, horizon, actions, fluents, change_ratio)
+            atoms += len(value)
+            # clingo writes one atom per line
+            output_file.write('        {\n          "Value": [\n            ')
+            output_file.write(",\n            ".join(dumps(atom) for atom in value))
+            output_file.write('\n          ]\n        }' + (",\n" if model < models - 1 else "\n"))
+
+        output_file.write('      ]\n    }\n  ],\n  "Result": "SATISFIABLE",\n')
+        output_file.write('  "Models": {\n    "Number": %d,\n    "More": "no"\n  },\n  "Calls": 1,\n' % models)
+        output_file.write('  "Time": {\n    "Total": 12.5,\n    "Solve": 10.0,\n    "Model": 0.5,\n    "Unsat": 0.0,\n    "CPU": 12.5\n  }\n}\n')
+
+    return atoms
+
+def measure_tokenizer(module, atoms, repeat):
+    """
+    Measures the atom tokenizer of pretty-print.py in process
+
+    Parameters
+    ----------
+    module : module
+        The pretty-print.py module
+    atoms : list
+        Atoms to tokenize
+    repeat : int
+        Number of measurements, the fastest is reported
+
+    Returns
+    -------
+    float
+        Time in seconds to tokenize all atoms once
+    """
+
+    # the same tokenizer parse_witness uses
+    tokenize = module.PrettyPrintClingoOutput(StringIO()).tokenize_atom
+    timings = []
+
+    for i in range(repeat):
+        start = perf_counter()
+
+        for atom in atoms:
+            tokenize(atom)
+
+        timings.append(perf_counter() - start)
+
+    return min(timings)
+
+def run_pretty_print(output_path, work_path, options):
+    """
+    Runs pretty-print.py once on a clingo output file
+
+    Parameters
+    ----------
+    output_path : str
+        The clingo output
+    work_path : str
+        Working directory results.txt is written to
+    options : list
+        Additional command line options
+
+    Returns
+    -------
+    float, int
+        Wall clock time in seconds and peak resident memory of the largest
+        process in kilobytes
+    """
+
+    with open(output_path) as clingo_output:
+        process = Popen([executable, "-c", measure_helper, executable, pretty_print] + options,
+            cwd=work_path, stdin=clingo_output, stdout=PIPE)
+        seconds, peak, returncode = process.communicate()[0].split()
+
+    if int(returncode) != 0:
+        raise RuntimeError("pretty-print.py %s failed with status %s" % (" ".join(options), returncode.decode()))
+
+    return float(seconds), int(peak)
+
+def main():
+    parser = ArgumentParser(description="Measures the throughput of pretty-print.py on synthetic clingo output")
+    parser.add_argument("--models", type=int, default=200, help="number of witnesses (default is 200)")
+    parser.add_argument("--horizon", type=int, default=100, help="number of timesteps per plan (default is 100)")
+    parser.add_argument("--actions", type=int, default=10, help="number of actions per timestep (default is 10)")
+    parser.add_argument("--fluents", type=int, default=40, help="number of fluents per timestep (default is 40)")
+    parser.add_argument("--change-ratio", type=float, default=0.1,
+        help="ratio of fluents that change from one timestep to the next (default is 0.1)")
+    parser.add_argument("--mode", action="append", metavar="OPTIONS",
+        help="pretty-print.py options to measure, can be given multiple times (default is \"\", \"--delta\" and \"--jobs 4\")")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per mode, the fastest is reported (default is 3)")
+    parser.add_argument("--keep", metavar="FILE", help="generate the clingo output into FILE and keep it")
+    args = parser.parse_args()
+
+    modes = args.mode if args.mode is not None else ["", "--delta", "--jobs 4"]
+    work_path = mkdtemp(prefix="benchmark-pretty-print-")
+    output_path = args.keep if args.keep is not None else join(work_path, "clingo.json")
+
+    try:
+        print("Generating %d models with horizon %d ..." % (args.models, args.horizon))
+        atoms = generate_output(output_path, args.models, args.horizon, args.actions, args.fluents, args.change_ratio)
+        size = getsize(output_path)
+        print("... Done: %d atoms, %.1f MB\n" % (atoms, size / 2**20))
+
+        # tokenize the atoms of one model over and over to keep the measurement in memory
+        sample = witness(Random(0), args.horizon, args.actions, args.fluents, args.change_ratio)
+        sample = sample * max(1, 10**6 // len(sample))
+        seconds = measure_tokenizer(load_pretty_print(), sample, args.repeat)
+        print("Tokenizer: %.0f atoms/s (%d atoms in %.3fs)\n" % (len(sample) / seconds, len(sample), seconds))
+
+        print("{:<30}{:>10}{:>12}{:>10}{:>12}{:>13}".format("MODE", "TIME (s)", "ATOMS/s", "MB/s", "PEAK (MB)", "OUTPUT (MB)"))
+
+        for mode in modes:
+            measurements = [run_pretty_print(output_path, work_path, mode.split()) for repeat in range(args.repeat)]
+            seconds = min(seconds for seconds, peak in measurements)
+            peak = max(peak for seconds, peak in measurements)
+
+            print("{:<30}{:>10.3f}{:>12.0f}{:>10.1f}{:>12.1f}{:>13.1f}".format(
+                mode if mode != "" else "(default)", seconds, atoms / seconds, size / 2**20 / seconds, peak / 1024,
+                getsize(join(work_path, "results.txt")) / 2**20
+            ))
+    finally:
+        rmtree(work_path)
+
+if __name__ == "__main__":
+    main()
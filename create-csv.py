@@ -1,108 +1,1224 @@
-#!/usr/local/bin/python3 
+#!/usr/local/bin/python3
 
-from sys import argv
-from os import listdir
+from argparse import ArgumentParser
+from os import scandir, stat, replace
+from os.path import join, isfile, dirname
 from datetime import date
-from statistics import mean, stdev
-from json import loads
+from statistics import mean, stdev, median
+from json import loads, load, dump
+from multiprocessing import Pool
+from mmap import mmap, ACCESS_READ
+from re import compile, escape, error as RegexError, MULTILINE
+from functools import lru_cache
+from itertools import groupby
+from sqlite3 import connect
+from array import array
+from math import floor, fsum, nan
+from hashlib import shake_128
+from sys import byteorder
+from warnings import catch_warnings, simplefilter
+from time import monotonic, sleep
+from signal import signal, SIGINT, SIG_IGN
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 # Usage:
-# python3 create-csv.py ./[RESULTS_FOLDER]/ [OUTPUT_FOLDER_NAME] [RUNS]
+# python3 create-csv.py ./[RESULTS_FOLDER]/ [OUTPUT_FOLDER_NAME] [RUNS] [--jobs N] [--cache] [--db FILE [--experiment NAME]]
+#     [--statistics mean,stdev,median,p90,p99,ci95] [--bootstrap SAMPLES] [--pattern REGEX]
+#     [--watch [--interval SECONDS]] [--schema FILE]
 
-today = date.today()
+runsolver_file = "runsolver.solver"
+watcher_file = "runsolver.watcher"
+run_pattern = compile(r"^run([0-9]+)$")
+# default instance directory names start with the horizon and end with the
+# instance number followed by three characters, e.g. 15-...-001.lp
+instance_pattern = r"^(?P<horizon>.{2}).*(?P<instance>[0-9]{3}).{3}$"
+interrupt_banner = b"*** Info : (clingo): INTERRUPTED by signal!\n"
 
-runsolver_path = "/run$/runsolver.solver"
-csv_file_path = "./" + today.strftime("%Y%m%d")
-instances_path = argv[1]
-runs = int(argv[3])
-csv_file_path += "-" + argv[2] + ".csv"
+# strings and brackets are the only tokens needed to find the end of a JSON value
+value_token = compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+scalar_value = compile(rb'"(?:[^"\\]|\\.)*"|[^\s,\]}]+')
 
 delimiter = ","
 
-header = [
-    "Instance",
-    "Horizon",
-    "Time Mean",
-    "Time StDev",
-    "Solving Mean",
-    "Solving StDev",
-    "Grounding Mean",
-    "Grounding StDev"
+db_schema = """
+CREATE TABLE IF NOT EXISTS runs (
+    experiment TEXT, instance INTEGER, horizon TEXT, run INTEGER, metric TEXT, value REAL
+);
+CREATE TABLE IF NOT EXISTS aggregates (
+    experiment TEXT, instance INTEGER, horizon TEXT, metric TEXT, statistic TEXT, value REAL
+);
+CREATE INDEX IF NOT EXISTS runs_experiment ON runs (experiment, instance, horizon);
+CREATE INDEX IF NOT EXISTS aggregates_experiment ON aggregates (experiment, instance, horizon);
+CREATE INDEX IF NOT EXISTS aggregates_instance ON aggregates (instance, horizon, metric, statistic);
+"""
+
+# metrics of the csv file if no schema is given; grounding time is derived
+# from the total and the solving time
+default_schema = [
+    {"name": "Time", "path": "Time.Total"},
+    {"name": "Solving", "path": "Time.Solve"},
+    {"name": "Grounding", "path": "Time.Total", "minus": "Time.Solve"}
 ]
 
-# create csv header
-stats_header=""
-for head in header:
-    stats_header += head
+# statistics that can be requested and the labels of their csv columns
+statistic_labels = {
+    "mean": ["Mean"],
+    "stdev": ["StDev"],
+    "median": ["Median"],
+    "p90": ["P90"],
+    "p99": ["P99"],
+    "ci95": ["CI95 Low", "CI95 High"]
+}
+
+# fixed seed to get the same confidence intervals for the same results, with and without NumPy
+bootstrap_seed = 0
+# number of bootstrap samples drawn at once per instance, see bootstrap_block
+bootstrap_block_size = 64
+
+@lru_cache(maxsize=None)
+def key_pattern(keys):
+    """
+    Compiles a pattern matching any of the given JSON keys including the colon
+
+    Parameters
+    ----------
+    keys : tuple
+        The JSON keys to look for
+
+    Returns
+    -------
+    Pattern
+        The compiled pattern, group 1 holds the found key
+    """
+
+    return compile(rb'(?<!\\)"(' + b"|".join(escape(key.encode()) for key in keys) + rb')"\s*:\s*')
+
+def value_end(buffer, start):
+    """
+    Finds the end of the JSON value starting at the given position without
+    decoding it
+
+    Parameters
+    ----------
+    buffer : bytes-like
+        The JSON document
+    start : int
+        Position of the first character of the value
+
+    Returns
+    -------
+    int
+        Position after the last character of the value
+    """
+
+    if buffer[start:start+1] not in (b"{", b"["):
+        return scalar_value.match(buffer, start).end()
+
+    depth = 0
+
+    for token in value_token.finditer(buffer, start):
+        bracket = token.group()
+
+        if bracket in (b"{", b"["):
+            depth += 1
+        elif bracket in (b"}", b"]"):
+            depth -= 1
+
+            if depth == 0:
+                return token.end()
+
+    raise ValueError("Unterminated JSON value at position %d" % start)
+
+def extract_fields(stats_file_path, fields):
+    """
+    Reads selected fields of a clingo JSON output file. The file is memory mapped
+    and scanned for the top-level keys of the requested fields; only the values
+    of these keys are decoded, the rest of the document (witnesses, statistics)
+    is skipped
+
+    Parameters
+    ----------
+    stats_file_path : str
+        Path to a runsolver.solver file containing clingo JSON output
+    fields : list
+        JSON paths as tuples of keys, e.g. ("Time", "Total")
+
+    Returns
+    -------
+    list
+        The values of the requested fields in the same order, None for fields
+        that are not in the file
+    """
+
+    keys = tuple(sorted(set(field[0] for field in fields)))
+    values = {}
+
+    with open(stats_file_path, "rb") as stats_file:
+        with mmap(stats_file.fileno(), 0, access=ACCESS_READ) as buffer:
+            for match in key_pattern(keys).finditer(buffer):
+                key = match.group(1).decode()
+
+                if key in values:
+                    continue
+
+                end = value_end(buffer, match.end())
+                # the interrupt banner breaks the JSON, only remove it from the extracted part
+                values[key] = loads(buffer[match.end():end].replace(interrupt_banner, b""))
+
+                if len(values) == len(keys):
+                    break
+
+    result = []
+
+    for field in fields:
+        value = values.get(field[0])
+
+        for key in field[1:]:
+            if not isinstance(value, dict):
+                value = None
+                break
+
+            value = value.get(key)
+
+        result.append(value)
+
+    return result
+
+class MetricSchema:
+    """
+    Compiled metric schema. A schema is a list of metrics, each described by a
+    dict with the following keys:
+        name : name of the metric used for the csv columns
+        source : solver (JSON output of clingo, default) or watcher (runsolver.watcher file)
+        path : dotted JSON path into the clingo output, e.g. Stats.Solving.Solvers.Choices (source solver)
+        minus : dotted JSON path of a value subtracted from the value at path (source solver, optional)
+        pattern : regular expression with one group matching the value (source watcher)
+        statistics : list of statistics computed for the metric (optional, default are
+            the statistics from the command line)
+    All fields of all metrics are read in a single pass per file
+
+    Attributes
+    ----------
+    metrics : list
+        The metrics of the schema
+    names : list
+        Names of the metrics
+    fields : list
+        JSON paths of all values read from the clingo output
+    watcher_patterns : list
+        The compiled pattern of every watcher metric
+    sources : list
+        Per metric the indices of its raw values (value and subtracted value)
+
+    Methods
+    -------
+    extract(stats_file_path)
+        Reads the raw values of one run
+    values(raw)
+        Computes the metrics of one run from its raw values
+    """
+
+    def __init__(self, metrics):
+        """
+        Parameters
+        ----------
+        metrics : list
+            The metrics of the schema
+        """
+
+        self.metrics = metrics
+        self.names = []
+        self.fields = []
+        self.sources = []
+        self.watcher_patterns = []
+
+        if not isinstance(metrics, list) or not all(isinstance(metric, dict) for metric in metrics):
+            raise ValueError("A schema is a list of metrics (JSON objects)")
+
+        for metric in metrics:
+            if "name" not in metric:
+                raise ValueError("Metric without name: %s" % metric)
+
+            source = metric.get("source", "solver")
+            required = "pattern" if source == "watcher" else "path"
+
+            for key in ("name", "source", "path", "minus", "pattern"):
+                if key in metric and not isinstance(metric[key], str):
+                    raise ValueError("%s of metric %s is not a string" % (key, metric["name"]))
+
+            if required not in metric:
+                raise ValueError("Metric %s needs a %s" % (metric["name"], required))
+
+            statistics = metric.get("statistics", [])
+
+            if not isinstance(statistics, list) or not all(isinstance(name, str) for name in statistics):
+                raise ValueError("statistics of metric %s is not a list of names" % metric["name"])
+
+            self.names.append(metric["name"])
+
+            if source == "watcher":
+                try:
+                    pattern = compile(metric["pattern"], MULTILINE)
+                except RegexError as error:
+                    raise ValueError("Invalid pattern of metric %s: %s" % (metric["name"], error))
+
+                if pattern.groups != 1:
+                    raise ValueError("Pattern of metric %s needs exactly one group" % metric["name"])
+
+                self.watcher_patterns.append(pattern)
+                self.sources.append((None, len(self.watcher_patterns) - 1, None))
+            else:
+                indices = []
+
+                for path in (metric["path"], metric.get("minus")):
+                    if path is None:
+                        indices.append(None)
+                        continue
+
+                    field = tuple(path.split("."))
+
+                    if field not in self.fields:
+                        self.fields.append(field)
+
+                    indices.append(self.fields.index(field))
+
+                self.sources.append((indices[0], None, indices[1]))
+
+    def extract(self, stats_file_path):
+        """
+        Reads the raw values of one run: all fields from the runsolver.solver
+        file followed by all watcher values from the runsolver.watcher file next
+        to it
+
+        Parameters
+        ----------
+        stats_file_path : str
+            Path to the runsolver.solver file of the run
+
+        Returns
+        -------
+        list
+            The raw values, None for values that were not found
+        """
+
+        raw = extract_fields(stats_file_path, self.fields) if len(self.fields) > 0 else []
+        watched = [None] * len(self.watcher_patterns)
+
+        if len(self.watcher_patterns) > 0:
+            try:
+                with open(join(dirname(stats_file_path), watcher_file), "r") as watcher:
+                    text = watcher.read()
+            except OSError:
+                text = ""
+
+            # every pattern is searched on its own, so several metrics can read the same line
+            for i, pattern in enumerate(self.watcher_patterns):
+                match = pattern.search(text)
+
+                try:
+                    watched[i] = float(match.group(1)) if match is not None else None
+                except (TypeError, ValueError):
+                    # the group did not take part in the match or is no number
+                    pass
+
+        return raw + watched
+
+    def values(self, raw):
+        """
+        Computes the metrics of one run in the order of the schema
+
+        Parameters
+        ----------
+        raw : list
+            The raw values of the run as returned by extract
+
+        Returns
+        -------
+        list
+            The metrics of the run, nan for metrics that could not be read or are
+            no numbers (e.g. a path to an object)
+        """
+
+        values = []
+        numbers = [
+            value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+            for value in raw
+        ]
+
+        for field, watched, minus in self.sources:
+            value = numbers[len(self.fields) + watched] if field is None else numbers[field]
+
+            if value is not None and minus is not None:
+                value = value - numbers[minus] if numbers[minus] is not None else None
+
+            values.append(nan if value is None else value)
+
+        return values
+
+def is_complete(stats_file_path):
+    """
+    Checks if clingo has finished writing a runsolver file, i.e. the JSON
+    document is closed
+
+    Parameters
+    ----------
+    stats_file_path : str
+        Path to a runsolver.solver file
+
+    Returns
+    -------
+    bool
+        True if the file ends with the closing brace of the JSON document
+    """
+
+    with open(stats_file_path, "rb") as stats_file:
+        size = stats_file.seek(0, 2)
+        stats_file.seek(max(0, size - 256))
+        tail = stats_file.read()
+
+    return tail.replace(interrupt_banner, b"").rstrip().endswith(b"}")
+
+def read_stats(stats_file_path, schema, cached=None, partial=False):
+    """
+    Reads the raw values of one clingo run. The file is only parsed if it is not
+    in the cache or has changed since it was cached
+
+    Parameters
+    ----------
+    stats_file_path : str
+        Path to a runsolver.solver file containing clingo JSON output
+    schema : MetricSchema
+        The metrics to read
+    cached : list, optional
+        The cache entry of the file from a previous run (default is None)
+    partial : bool, optional
+        Benchmarks may still be running, files that are not finished are
+        skipped (default is False)
+
+    Returns
+    -------
+    list
+        Size and modification time of the file followed by the raw values of
+        the run (the cache entry of the file); None if the run is not finished
+        yet and partial is set
+
+    Raises
+    ------
+    ValueError
+        If the file is not finished or cannot be parsed and partial is not set
+    """
+
+    file_stat = stat(stats_file_path)
+    signature = [file_stat.st_size, file_stat.st_mtime_ns]
+
+    if cached is not None and cached[:2] == signature:
+        return cached
+
+    try:
+        if not is_complete(stats_file_path):
+            raise ValueError("the JSON document is not closed")
+
+        return signature + schema.extract(stats_file_path)
+    except ValueError as error:
+        # a running benchmark is read again by the next poll
+        if partial:
+            return None
+
+        raise ValueError("%s is not finished or corrupt: %s" % (stats_file_path, error))
+
+def discover_runs(instance_path, instance, horizon, runs):
+    """
+    Yields the runs found in one instance directory ordered by run number; runs
+    without runsolver file are skipped
+
+    Parameters
+    ----------
+    instance_path : str
+        Path to the instance directory
+    instance : int
+        The instance number
+    horizon : str
+        The horizon of the instance
+    runs : int
+        Maximum number of runs per instance, runs with a higher number are skipped
+
+    Yields
+    ------
+    tuple
+        Instance number, horizon, run number and path to the runsolver file
+    """
+
+    found = []
+
+    with scandir(instance_path) as entries:
+        for entry in entries:
+            match = run_pattern.match(entry.name)
+
+            if match is None or int(match.group(1)) > runs:
+                continue
+
+            stats_file_path = join(entry.path, runsolver_file)
+
+            if isfile(stats_file_path):
+                found.append((int(match.group(1)), stats_file_path))
+
+    for run, stats_file_path in sorted(found):
+        yield instance, horizon, run, stats_file_path
+
+def discover(instances_path, pattern, runs):
+    """
+    Lazily walks the (possibly nested) results folder. Directories whose name
+    matches the pattern are instance directories, all other directories are
+    searched for instance directories
+
+    Parameters
+    ----------
+    instances_path : str
+        The results folder
+    pattern : Pattern
+        Compiled pattern for instance directory names with the named groups
+        instance and horizon
+    runs : int
+        Maximum number of runs per instance
+
+    Yields
+    ------
+    tuple
+        Instance number, horizon, run number and path to the runsolver file;
+        all runs of an instance directory are yielded one after another
+
+    Raises
+    ------
+    ValueError
+        If two instance directories have the same instance number and horizon
+    """
+
+    directories = [instances_path]
+    # the rows of the csv file are identified by instance number and horizon
+    instance_paths = {}
+
+    while len(directories) > 0:
+        with scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.name[0] == "." or not entry.is_dir():
+                    continue
+
+                match = pattern.search(entry.name)
+
+                if match is None:
+                    directories.append(entry.path)
+                else:
+                    if not match.group("instance").isdigit():
+                        raise ValueError("instance of directory %s is not a number: %s" % (entry.path, match.group("instance")))
+
+                    key = (int(match.group("instance")), match.group("horizon"))
+
+                    if key in instance_paths:
+                        raise ValueError("instance directories %s and %s both have instance %d and horizon %s"
+                            % (instance_paths[key], entry.path, key[0], key[1]))
+
+                    instance_paths[key] = entry.path
+
+                    yield from discover_runs(entry.path, key[0], key[1], runs)
+
+def read_instance(key, found, schema, cache=None, partial=False):
+    """
+    Reads all runs of one instance. Runs in the worker processes if more than
+    one job is used
+
+    Parameters
+    ----------
+    key : tuple
+        Instance number and horizon
+    found : list
+        Run numbers and paths to the runsolver files of the instance
+    schema : MetricSchema
+        The metrics to read
+    cache : dict, optional
+        Cache entries of the runsolver files of this instance (default is None)
+    partial : bool, optional
+        Skips runs that are not finished, see read_stats (default is False)
+
+    Returns
+    -------
+    tuple, list
+        Instance number and horizon as well as run number, path and cache entry
+        of all finished runs of the instance in the order of the runs
+    """
+
+    if cache is None:
+        cache = {}
+
+    entries = []
+
+    for run, stats_file_path in found:
+        entry = read_stats(stats_file_path, schema, cache.get(stats_file_path), partial)
+
+        if entry is not None:
+            entries.append((run, stats_file_path, entry))
+
+    return key, entries
+
+def read_instance_task(task):
+    """
+    Unpacks a task of the process pool for read_instance
+    """
+
+    return read_instance(*task)
+
+def instance_tasks(instances_path, pattern, runs, schema, cache, seen=frozenset(), partial=False):
+    """
+    Goes through all instance directories of the results folder and creates
+    the tasks for read_instance
+
+    Parameters
+    ----------
+    instances_path : str
+        The results folder
+    pattern : Pattern
+        Compiled pattern for instance directory names
+    runs : int
+        Maximum number of runs per instance
+    schema : MetricSchema
+        The metrics to read
+    cache : dict
+        Cache entries by runsolver file path
+    seen : set, optional
+        Runsolver files that have already been read and are skipped (default is empty)
+    partial : bool, optional
+        Skips runs that are not finished, see read_stats (default is False)
+
+    Yields
+    ------
+    tuple
+        Instance number and horizon, runs to read, the schema, the cache
+        entries of the runs and partial
+    """
+
+    for key, found in groupby(discover(instances_path, pattern, runs), lambda run: run[:2]):
+        found = [run[2:] for run in found if run[3] not in seen]
+
+        if len(found) > 0:
+            # only hand the cache entries of the instance to the worker
+            yield key, found, schema, {path: cache[path] for run, path in found if path in cache}, partial
+
+def read_results(pool, tasks):
+    """
+    Runs read_instance for all tasks, in the process pool if there is one
+
+    Parameters
+    ----------
+    pool : Pool
+        The process pool or None
+    tasks : iterable
+        Tasks as created by instance_tasks
+
+    Returns
+    -------
+    list
+        Instance keys and finished runs as returned by read_instance
+    """
+
+    if pool is not None:
+        return list(pool.imap_unordered(read_instance_task, tasks, chunksize=16))
+
+    return [read_instance(*task) for task in tasks]
+
+def build_matrix(results, runs, schema):
+    """
+    Collects the metrics of all runs in a matrix of shape instances x runs x metrics,
+    stored row-major in a flat array. The runs of an instance are stored without
+    gaps, missing runs at the end are nan
+
+    Parameters
+    ----------
+    results : list
+        Instance keys and runs as returned by read_instance
+    runs : int
+        Number of runs per instance
+    schema : MetricSchema
+        The metrics of the runs
+
+    Returns
+    -------
+    array, list
+        The matrix and the number of runs found per instance
+    """
+
+    width = len(schema.names)
+    matrix = array("d", [nan]) * (len(results) * runs * width)
+    counts = []
+
+    for i, (key, entries) in enumerate(results):
+        offset = i * runs * width
+
+        # an instance has room for the given number of runs only
+        for j, (run, stats_file_path, entry) in enumerate(entries[:runs]):
+            start = offset + j * width
+            matrix[start:start + width] = array("d", schema.values(entry[2:]))
+
+        counts.append(min(len(entries), runs))
+
+    return matrix, counts
+
+def percentile(values, q):
+    """
+    Returns the q-th percentile of sorted values, linearly interpolated like numpy
+
+    Parameters
+    ----------
+    values : list
+        Sorted values
+    q : float
+        The percentile between 0 and 100
+
+    Returns
+    -------
+    float
+        The percentile, nan if there are no values
+    """
+
+    if len(values) == 0:
+        return nan
+
+    position = (len(values) - 1) * q / 100
+    lower = floor(position)
+    upper = min(lower + 1, len(values) - 1)
+
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def bootstrap_block(instance, block, runs):
+    """
+    Draws the random numbers of a block of bootstrap samples of one instance.
+    The numbers only depend on the seed, the instance and the block, so the pure
+    Python and the NumPy statistics resample with the same runs, no matter in
+    which order they draw the blocks. Run j of sample s of the block is drawn
+    by number r = s * runs + j as (r * count) >> 32 (count is the number of runs
+    found)
+
+    Parameters
+    ----------
+    instance : int
+        Position of the instance in the matrix
+    block : int
+        Number of the block, the block holds the samples from block * bootstrap_block_size on
+    runs : int
+        Number of runs per instance
+
+    Returns
+    -------
+    array
+        bootstrap_block_size * runs unsigned 32 bit numbers
+    """
+
+    numbers = array("I", shake_128(b"%d %d %d" % (bootstrap_seed, instance, block)).digest(bootstrap_block_size * runs * 4))
+
+    # the digest is read as little endian numbers on every machine
+    if byteorder == "big":
+        numbers.byteswap()
+
+    return numbers
+
+def python_statistics(matrix, counts, runs, width, requested, samples):
+    """
+    Computes the requested statistics for all instances and metrics in pure Python
+
+    Parameters
+    ----------
+    matrix : array
+        Metrics of all runs as returned by build_matrix
+    counts : list
+        Number of runs found per instance
+    runs : int
+        Number of runs per instance
+    width : int
+        Number of metrics
+    requested : list
+        Names of the statistics to compute (keys of statistic_labels)
+    samples : int
+        Number of bootstrap samples for confidence intervals
+
+    Returns
+    -------
+    dict
+        Per statistic one instances x metrics table per label
+    """
+
+    values = {name: [[] for label in statistic_labels[name]] for name in requested}
+
+    for i, count in enumerate(counts):
+        for name in requested:
+            for table in values[name]:
+                table.append([])
+
+        if "ci95" in requested:
+            # all metrics of an instance are resampled with the same runs like in numpy_bootstrap
+            picks = []
+
+            for block in range(0, samples, bootstrap_block_size):
+                numbers = bootstrap_block(i, block // bootstrap_block_size, runs)
+
+                for sample in range(min(bootstrap_block_size, samples - block)):
+                    picks.append([(numbers[sample * runs + j] * count) >> 32 for j in range(count)])
+
+        for m in range(width):
+            # metrics that could not be read (nan) are ignored like NumPy's nan functions do
+            runs_column = [matrix[(i * runs + j) * width + m] for j in range(count)]
+            column = [value for value in runs_column if value == value]
+            size = len(column)
+            ordered = sorted(column)
+
+            for name in requested:
+                if name == "mean":
+                    results = [mean(column) if size > 0 else nan]
+                elif name == "stdev":
+                    results = [stdev(column) if size > 1 else nan]
+                elif name == "median":
+                    results = [median(column) if size > 0 else nan]
+                elif name in ("p90", "p99"):
+                    results = [percentile(ordered, int(name[1:]))]
+                elif name == "ci95":
+                    means = []
+
+                    for sample in picks:
+                        drawn = [runs_column[j] for j in sample if runs_column[j] == runs_column[j]]
+
+                        if len(drawn) > 0:
+                            means.append(fsum(drawn) / len(drawn))
+
+                    means.sort()
+                    results = [percentile(means, 2.5), percentile(means, 97.5)]
+
+                for table, result in zip(values[name], results):
+                    table[i].append(result)
+
+    return values
+
+def numpy_bootstrap(data, counts, samples):
+    """
+    Computes 95% bootstrap confidence intervals of the mean for all instances and
+    metrics at once
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Matrix of shape instances x runs x metrics
+    counts : numpy.ndarray
+        Number of runs found per instance
+    samples : int
+        Number of bootstrap samples
+
+    Returns
+    -------
+    numpy.ndarray, numpy.ndarray
+        Lower and upper bounds, both of shape instances x metrics
+    """
+
+    instances, runs, width = data.shape
+    means = numpy.empty((samples, instances, width))
+    rows = numpy.arange(instances)[None, :, None]
+    missing = numpy.arange(runs)[None, None, :] >= counts[None, :, None]
+    # resample in chunks of whole blocks to bound the memory used by the resampled matrices
+    blocks = max(1, (1 << 22) // max(1, data.size * bootstrap_block_size))
+
+    for first in range(0, samples, blocks * bootstrap_block_size):
+        size = min(blocks * bootstrap_block_size, samples - first)
+        block = first // bootstrap_block_size
+        numbers = numpy.frombuffer(b"".join(
+            bootstrap_block(i, b, runs).tobytes()
+            for i in range(instances) for b in range(block, block + -(-size // bootstrap_block_size))
+        ), dtype=numpy.uint32)
+        # the numbers are stored per instance, the picks per sample
+        numbers = numbers.reshape(instances, -1, runs)[:, :size].transpose(1, 0, 2)
+        picks = ((numbers.astype(numpy.uint64) * counts.astype(numpy.uint64)[None, :, None]) >> numpy.uint64(32))
+        resampled = data[rows, picks.astype(numpy.intp)]
+        resampled[numpy.broadcast_to(missing, picks.shape)] = nan
+        means[first:first + size] = numpy.nanmean(resampled, axis=2)
+
+    return numpy.nanpercentile(means, [2.5, 97.5], axis=0)
+
+def numpy_statistics(matrix, counts, runs, width, requested, samples):
+    """
+    Computes the requested statistics for all instances and metrics with NumPy,
+    each statistic in one vectorized pass over the matrix
+
+    Parameters
+    ----------
+    matrix : array
+        Metrics of all runs as returned by build_matrix
+    counts : list
+        Number of runs found per instance
+    runs : int
+        Number of runs per instance
+    width : int
+        Number of metrics
+    requested : list
+        Names of the statistics to compute (keys of statistic_labels)
+    samples : int
+        Number of bootstrap samples for confidence intervals
+
+    Returns
+    -------
+    dict
+        Per statistic one instances x metrics table per label
+    """
+
+    data = numpy.frombuffer(matrix, dtype=numpy.float64).reshape(len(counts), runs, width)
+    values = {}
+
+    with catch_warnings():
+        # instances without enough runs result in nan
+        simplefilter("ignore", RuntimeWarning)
+
+        for name in requested:
+            if name == "mean":
+                values[name] = [numpy.nanmean(data, axis=1)]
+            elif name == "stdev":
+                values[name] = [numpy.nanstd(data, axis=1, ddof=1)]
+            elif name == "median":
+                values[name] = [numpy.nanmedian(data, axis=1)]
+            elif name in ("p90", "p99"):
+                values[name] = [numpy.nanpercentile(data, int(name[1:]), axis=1)]
+            elif name == "ci95":
+                values[name] = list(numpy_bootstrap(data, numpy.array(counts), samples))
+
+    return values
+
+def compute_statistics(results, runs, schema, requested, samples):
+    """
+    Computes the statistics of all instances; NumPy is used if it is installed
+
+    Parameters
+    ----------
+    results : list
+        Instance keys and runs as returned by read_instance
+    runs : int
+        Number of runs per instance
+    schema : MetricSchema
+        The metrics of the runs
+    requested : list
+        Names of the statistics computed for metrics that do not list their own
+    samples : int
+        Number of bootstrap samples for confidence intervals
+
+    Returns
+    -------
+    list, list
+        The (metric, label) pairs of the columns and per instance a row with
+        instance number, horizon and the values of the columns
+    """
+
+    names = [metric.get("statistics", requested) for metric in schema.metrics]
+    matrix, counts = build_matrix(results, runs, schema)
+    statistics = numpy_statistics if numpy is not None else python_statistics
+    # every statistic is computed for all metrics at once, the columns pick the requested ones
+    values = statistics(matrix, counts, runs, len(schema.names), list(dict.fromkeys(sum(names, []))), samples)
+
+    columns = []
+    tables = []
+
+    for m, metric in enumerate(schema.names):
+        for name in names[m]:
+            for label, table in zip(statistic_labels[name], values[name]):
+                columns.append((metric, label))
+                tables.append((table, m))
+
+    rows = [
+        list(key) + [float(table[i][m]) for table, m in tables]
+        for i, (key, entries) in enumerate(results)
+    ]
+
+    return columns, rows
+
+def load_cache(cache_file_path, schema):
+    """
+    Loads the cache of extracted values written by a previous run
+
+    Parameters
+    ----------
+    cache_file_path : str
+        Path to the cache file
+    schema : MetricSchema
+        The metrics to read
+
+    Returns
+    -------
+    dict
+        Cache entries by runsolver file path; empty if there is no usable cache
+    """
+
+    try:
+        with open(cache_file_path, "r") as cache_file:
+            cache = load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+    # entries extracted with another schema can not be reused
+    if cache.get("schema") != schema.metrics:
+        return {}
+
+    return cache["files"]
+
+def save_cache(cache_file_path, schema, files):
+    """
+    Writes the cache of extracted values; the file is replaced atomically
+
+    Parameters
+    ----------
+    cache_file_path : str
+        Path to the cache file
+    schema : MetricSchema
+        The metrics the values were read for
+    files : dict
+        Cache entries by runsolver file path
+    """
+
+    with open(cache_file_path + ".tmp", "w") as cache_file:
+        dump({"schema": schema.metrics, "files": files}, cache_file)
+
+    replace(cache_file_path + ".tmp", cache_file_path)
+
+def save_to_db(db_file_path, experiment, schema, results, columns, rows):
+    """
+    Stores the raw metrics of all runs and the aggregated values of all instances
+    of one experiment in a SQLite database. Rows previously stored for the same
+    experiment are replaced
+
+    Parameters
+    ----------
+    db_file_path : str
+        Path to the SQLite database, created if it does not exist
+    experiment : str
+        Name of the experiment
+    schema : MetricSchema
+        The metrics of the runs
+    results : list
+        Instance keys and runs as returned by read_instance
+    columns : list
+        The (metric, statistic) pairs of the aggregated values
+    rows : list
+        Instance number, horizon and aggregated values per instance
+    """
+
+    db = connect(db_file_path)
+
+    try:
+        with db:
+            db.executescript(db_schema)
+            db.execute("DELETE FROM runs WHERE experiment = ?", (experiment,))
+            db.execute("DELETE FROM aggregates WHERE experiment = ?", (experiment,))
+
+            db.executemany("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)", (
+                (experiment, key[0], key[1], i, metric, value)
+                for key, entries in results
+                for i, stats_file_path, entry in entries
+                for metric, value in zip(schema.names, schema.values(entry[2:]))
+            ))
+            db.executemany("INSERT INTO aggregates VALUES (?, ?, ?, ?, ?, ?)", (
+                (experiment, row[0], row[1], metric, statistic, value)
+                for row in rows
+                for (metric, statistic), value in zip(columns, row[2:])
+            ))
+    finally:
+        db.close()
+
+def write_csv(csv_file_path, columns, rows):
+    """
+    Writes the csv file; it is replaced atomically, so readers never see a
+    partially written file
+
+    Parameters
+    ----------
+    csv_file_path : str
+        Path to the csv file
+    columns : list
+        The (metric, statistic) pairs of the aggregated values
+    rows : list
+        Instance number, horizon and aggregated values per instance
+    """
+
+    header = ["Instance", "Horizon"] + [metric + " " + label for metric, label in columns]
+
+    with open(csv_file_path + ".tmp", "w+") as csv_file:
+        csv_file.write(delimiter.join(header) + "\n")
+        csv_file.write("\n".join(delimiter.join(str(value) for value in row) for row in rows))
+
+    replace(csv_file_path + ".tmp", csv_file_path)
+
+def save_results(args, schema, csv_file_path, cache_file_path, results, columns, rows):
+    """
+    Writes the csv file and, if requested, the cache and the database
+
+    Parameters
+    ----------
+    args : Namespace
+        The command line arguments
+    schema : MetricSchema
+        The metrics of the runs
+    csv_file_path : str
+        Path to the csv file
+    cache_file_path : str
+        Path to the cache file
+    results : list
+        Instance keys and runs as returned by read_instance, sorted by key
+    columns : list
+        The (metric, statistic) pairs of the aggregated values
+    rows : list
+        Instance number, horizon and aggregated values per instance, sorted by key
+    """
+
+    write_csv(csv_file_path, columns, rows)
+
+    if args.cache:
+        # files that are gone are dropped from the cache
+        save_cache(cache_file_path, schema, {path: entry for key, entries in results for run, path, entry in entries})
+
+    if args.db:
+        save_to_db(args.db, args.experiment or args.name, schema, results, columns, rows)
+
+def watch(args, pool, pattern, schema, requested, csv_file_path, cache_file_path, cache):
+    """
+    Polls the results folder until interrupted (Ctrl+C). Every finished
+    runsolver file is read exactly once; only the rows of instances with
+    new runs are recomputed and the output files are rewritten after every
+    poll that found new runs
+
+    Parameters
+    ----------
+    args : Namespace
+        The command line arguments
+    pool : Pool
+        The process pool or None
+    pattern : Pattern
+        Compiled pattern for instance directory names
+    schema : MetricSchema
+        The metrics to read
+    requested : list
+        Names of the statistics to compute
+    csv_file_path : str
+        Path to the csv file
+    cache_file_path : str
+        Path to the cache file
+    cache : dict
+        Cache entries by runsolver file path
+    """
+
+    seen = set()
+    instances = {}
+    rows = {}
+    columns = compute_statistics([], args.runs, schema, requested, args.bootstrap)[0]
+
+    print("Watching %s, press Ctrl+C to stop ..." % args.instances_path)
 
-    if head != header[-1]:
-        stats_header += delimiter
-    else:
-        stats_header += "\n"
+    try:
+        while True:
+            start = monotonic()
+            changed = []
 
-stats = []
+            for key, entries in read_results(pool, instance_tasks(args.instances_path, pattern, args.runs, schema, cache, seen, True)):
+                if len(entries) == 0:
+                    continue
 
-# go through all subdirs of results folder to read out stats from clingo
-dir_list = listdir(instances_path)
+                instances[key] = sorted(instances.get(key, []) + entries)
+                seen.update(path for run, path, entry in entries)
+                changed.append((key, instances[key]))
 
-for dir in dir_list:
-    if dir[0] == ".":
-        continue
+            if len(changed) > 0:
+                for row in compute_statistics(changed, args.runs, schema, requested, args.bootstrap)[1]:
+                    rows[tuple(row[:2])] = row
 
-    # extract instance number
-    stats_csv_line = str(int(dir[(len(dir)-6):(len(dir)-3)])) + delimiter
-    # extract horizon
-    stats_csv_line += dir[0:2] + delimiter
+                results = sorted(instances.items())
+                save_results(args, schema, csv_file_path, cache_file_path, results, columns, [rows[key] for key, entries in results])
+                print("Updated file: %s (%d runs of %d instances)" % (csv_file_path, len(seen), len(instances)))
 
-    total_list = []
-    solving_list = []
-    grounding_list = []
+            sleep(max(0, args.interval - (monotonic() - start)))
+    except KeyboardInterrupt:
+        print("... Stopped.")
 
-    for i in range(1,runs + 1):
-        stats_file_path = instances_path + dir + runsolver_path.replace("$", str(i))
-        stats_file = open(stats_file_path, "r")
-        interrupt = False
+def main():
+    parser = ArgumentParser(description="Extracts benchmark results and creates CSV files")
+    parser.add_argument("instances_path", metavar="RESULTS_FOLDER")
+    parser.add_argument("name", metavar="OUTPUT_FOLDER_NAME")
+    parser.add_argument("runs", metavar="RUNS", type=int, help="(maximum) number of runs per instance")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+        help="number of worker processes reading instance directories (default is 1)")
+    parser.add_argument("--cache", action="store_true",
+        help="only parse new or changed runsolver files, values of the others are "
+            "kept in ./[OUTPUT_FOLDER_NAME].cache.json")
+    parser.add_argument("--db", metavar="FILE",
+        help="additionally store the raw metrics and the aggregated values in a SQLite database")
+    parser.add_argument("--experiment", metavar="NAME",
+        help="name of the experiment in the database (default is OUTPUT_FOLDER_NAME)")
+    parser.add_argument("--statistics", default="mean,stdev",
+        help="comma separated statistics per metric, any of " + ",".join(statistic_labels) + " (default is mean,stdev)")
+    parser.add_argument("--bootstrap", metavar="SAMPLES", type=int, default=1000,
+        help="number of bootstrap samples for confidence intervals (default is 1000)")
+    parser.add_argument("--pattern", metavar="REGEX", default=instance_pattern,
+        help="pattern for instance directory names with the named groups instance and horizon "
+            "(default is %s)" % instance_pattern.replace("%", "%%"))
+    parser.add_argument("--watch", action="store_true",
+        help="keep polling the results folder and update the output files while benchmarks are running")
+    parser.add_argument("--interval", metavar="SECONDS", type=float, default=60,
+        help="seconds between two polls in watch mode (default is 60)")
+    parser.add_argument("--schema", metavar="FILE",
+        help="JSON file with the list of metrics to extract (default are total, solving and grounding time)")
+    args = parser.parse_args()
 
-        if stats_file.mode == "r":
-            file_content = stats_file.read()
-            # fix broken JSON
-            if "*** Info : (clingo): INTERRUPTED by signal!" in file_content:
-                interrupt = True
-                file_content = file_content.replace("*** Info : (clingo): INTERRUPTED by signal!\n", "")
+    requested = args.statistics.split(",")
 
-            stats_file_contents = (loads(file_content))
+    try:
+        pattern = compile(args.pattern)
+    except RegexError as error:
+        parser.error("invalid pattern: %s" % error)
 
-            total_list.append(stats_file_contents["Time"]["Total"])
-            solving_list.append(stats_file_contents["Time"]["Solve"])
-            grounding_list.append((stats_file_contents["Time"]["Total"] - stats_file_contents["Time"]["Solve"]))
+    for group in ("instance", "horizon"):
+        if group not in pattern.groupindex:
+            parser.error("invalid pattern: the named group %s is missing" % group)
 
-            if i == runs:
-                total_mean = mean(total_list)
-                solving_mean = mean(solving_list)
-                grounding_mean = mean(grounding_list)
+    try:
+        if args.schema:
+            with open(args.schema, "r") as schema_file:
+                schema = MetricSchema(load(schema_file))
+        else:
+            schema = MetricSchema(default_schema)
+    except (OSError, ValueError, KeyError) as error:
+        parser.error("invalid schema: %s" % error)
 
-                total_stdev = stdev(total_list)
-                solving_stdev = stdev(solving_list)
-                grounding_stdev = stdev(grounding_list)
+    for name in requested + sum((metric.get("statistics", []) for metric in schema.metrics), []):
+        if name not in statistic_labels:
+            parser.error("unknown statistic: %s" % name)
 
-                # create csv line for current instance
-                stats_csv_line += str(total_mean) + "," + str(total_stdev) + "," +\
-                    str(solving_mean) + "," + str(solving_stdev) + "," +\
-                    str(grounding_mean) + "," + str(grounding_stdev)
+    csv_file_path = "./" + date.today().strftime("%Y%m%d") + "-" + args.name + ".csv"
+    cache_file_path = "./" + args.name + ".cache.json"
+    cache = load_cache(cache_file_path, schema) if args.cache else {}
+    # Ctrl+C is only handled by the main process (stops watch mode)
+    pool = Pool(args.jobs, initializer=signal, initargs=(SIGINT, SIG_IGN)) if args.jobs > 1 else None
 
-                if dir != dir_list[-1]:
-                    stats_csv_line += "\n"
+    try:
+        if args.watch:
+            watch(args, pool, pattern, schema, requested, csv_file_path, cache_file_path, cache)
+            return
 
-                stats.append(stats_csv_line)
-        stats_file.close()
+        results = read_results(pool, instance_tasks(args.instances_path, pattern, args.runs, schema, cache))
+    except ValueError as error:
+        parser.error(error)
+    finally:
+        if pool is not None:
+            pool.terminate()
 
-# write created csv lines to csv file
-csv_file = open(csv_file_path, "w+")
-csv_file.write(stats_header)
+    # sorted to keep the order of the csv lines independent of the file system
+    results.sort(key=lambda result: result[0])
+    columns, rows = compute_statistics(results, args.runs, schema, requested, args.bootstrap)
+    save_results(args, schema, csv_file_path, cache_file_path, results, columns, rows)
 
-for stat in stats:
-    csv_file.write(stat)
+    print("Created file: %s" % csv_file_path)
 
-csv_file.close()
+    if args.db:
+        print("Stored experiment %s in: %s" % (args.experiment or args.name, args.db))
 
-print("Created file: %s" % csv_file_path)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,220 @@
 #!/usr/local/bin/python3
 
-from re import findall, finditer, sub
-from sys import argv
+from argparse import ArgumentParser
+from re import findall, compile
 from subprocess import call
+from collections import deque
+from array import array
 
 # based on Dijkstras Shunting Yard Algorithm described in ``ALGOL-60 translation''
 # AND
 # https://www.esimovmiras.cc/articles/03-build-math-ast-parser/ (accessed: 2019-12-13)
 # AND
 # https://brilliant.org/wiki/shunting-yard-algorithm/ (accessed: 2019-12-13)
+class AST:
+    """
+    Abstract syntax tree of a Golog program or a fluent formula, stored in parallel
+    arrays. Nodes are referred to by their id, the children of node i are
+    children[start[i]:start[i] + count[i]]
+
+    Attributes
+    ----------
+    ATOM : int
+        Opcode of atoms, operators use the index of their name in GOLOGToASP.names
+    opcodes : array
+        Opcode of every node
+    labels : array
+        Label id of every atom, -1 for operators
+    start : array
+        Start of the children of every node in children
+    count : array
+        Number of children of every node
+    children : array
+        The children of all nodes
+    label_ids : dict
+        Id of every label
+    label_names : list
+        Label of every id
+    root : int
+        Id of the root node
+    nodes : dict
+        Id of every distinct subtree if subtrees are shared, otherwise None
+
+    Methods
+    -------
+    add_atom(label)
+        Adds a leaf and returns its id
+    add_node(opcode, children)
+        Adds an operator node and returns its id
+    get_children(node)
+        Returns the children of a node
+    get_label(node)
+        Returns the label of an atom
+    breadth_first()
+        Numbers the nodes in breadth first order
+    """
+
+    ATOM = -1
+
+    __slots__ = ("opcodes", "labels", "start", "count", "children", "label_ids", "label_names", "root", "nodes")
+
+    def __init__(self, shared=False):
+        """
+        Parameters
+        ----------
+        shared : bool, optional
+            Stores structurally identical subtrees once, i.e. the tree becomes a
+            DAG (default is False)
+        """
+
+        self.opcodes = array("b")
+        self.labels = array("l")
+        self.start = array("L")
+        self.count = array("L")
+        self.children = array("L")
+        self.label_ids = {}
+        self.label_names = []
+        self.root = 0
+        self.nodes = {} if shared else None
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def add_atom(self, label):
+        """
+        Adds a leaf, every distinct label is stored once. If subtrees are shared
+        the existing leaf of the label is returned instead
+
+        Parameters
+        ----------
+        label : str
+            The atom, e.g. move(X,D){robot(X),direction(D)}
+
+        Returns
+        -------
+        int
+            The id of the new node
+        """
+
+        id = self.label_ids.get(label)
+
+        if id is None:
+            id = self.label_ids[label] = len(self.label_names)
+            self.label_names.append(label)
+
+        if self.nodes != None:
+            key = (self.ATOM, id)
+
+            if key in self.nodes:
+                return self.nodes[key]
+
+            self.nodes[key] = len(self.opcodes)
+
+        self.opcodes.append(self.ATOM)
+        self.labels.append(id)
+        self.start.append(len(self.children))
+        self.count.append(0)
+
+        return len(self.opcodes) - 1
+
+    def add_node(self, opcode, children):
+        """
+        Adds an operator node. If subtrees are shared and there already is a node
+        with the same operator and children, its id is returned instead
+
+        Parameters
+        ----------
+        opcode : int
+            Index of the operator name
+        children : list
+            Ids of the operands
+
+        Returns
+        -------
+        int
+            The id of the new node
+        """
+
+        if self.nodes != None:
+            key = (opcode,) + tuple(children)
+
+            if key in self.nodes:
+                return self.nodes[key]
+
+            self.nodes[key] = len(self.opcodes)
+
+        self.opcodes.append(opcode)
+        self.labels.append(-1)
+        self.start.append(len(self.children))
+        self.count.append(len(children))
+        self.children.extend(children)
+
+        return len(self.opcodes) - 1
+
+    def get_children(self, node):
+        """
+        Returns the children of a node
+
+        Parameters
+        ----------
+        node : int
+            The id of the node
+
+        Returns
+        -------
+        array
+            The ids of the children, empty for atoms
+        """
+
+        start = self.start[node]
+
+        return self.children[start:start + self.count[node]]
+
+    def get_label(self, node):
+        """
+        Returns the label of an atom
+
+        Parameters
+        ----------
+        node : int
+            The id of the atom
+
+        Returns
+        -------
+        str
+            The label
+        """
+
+        return self.label_names[self.labels[node]]
+
+    def breadth_first(self):
+        """
+        Numbers the nodes reachable from the root in breadth first order, starting
+        with 0 for the root. Shared nodes are numbered once
+
+        Returns
+        -------
+        list, array
+            The nodes in breadth first order and the number of every node
+            (-1 for nodes that are not reachable)
+        """
+
+        numbers = array("l", [-1]) * len(self.opcodes)
+        numbers[self.root] = 0
+        order = [self.root]
+        queue = deque(order)
+
+        while len(queue) > 0:
+            node = queue.popleft()
+
+            for child in self.get_children(node):
+                if numbers[child] < 0:
+                    numbers[child] = len(order)
+                    order.append(child)
+                    queue.append(child)
+
+        return order, numbers
+
 class GOLOGToASP:
     """
     GOLOG to ASP/Dot class. Can be used to translate Golog programs to Dot and ASP. Fluent formulas need to be enclosed in hash symbols. Usage of parentheses:
@@ -22,9 +228,27 @@ class GOLOGToASP:
         Contains lists for the determination of operator precedence
     names : dict
         Contains lists of operator names
+    operators : dict
+        Precedence and name of every operator, built from precedence and names
+    prefix : dict
+        Unary operators written in front of their operand
+    postfix : dict
+        Unary operators written behind their operand
+    tokens : dict
+        Compiled patterns splitting Golog programs and fluent formulas into tokens
     re : str
         The Golog program from the command line
-    ast : list
+    dag : bool
+        Shares structurally identical subprograms and subformulas
+    simplify : bool
+        Simplifies the Golog program and the formulas before they are written
+    parsed : int
+        Number of AST nodes parsed (Golog program and formulas)
+    removed : int
+        Number of AST nodes removed by the simplification
+    associative : dict
+        Operators whose nested occurrences are merged into one node with many children
+    ast : AST
         Holds the generated abstract syntax tree of the given Golog program
     gst_template : dict
         Template strings for the generation of ASP programs representing the Golog program
@@ -32,8 +256,15 @@ class GOLOGToASP:
         Template strings for the generation of ASP programs representing formulas
     dot_template : dict
         Template string for the generation of DOT files representing the Golog program
-    formulas : dict
-        All logical formulas found in the given Golog program
+    formula_pattern : Pattern
+        Matches fluent formulas (tests) inside the Golog program
+    formulas : list
+        All logical formulas found in the given Golog program, the index is the formula id
+    formula_ids : dict
+        The id of every logical formula in formulas
+    formula_asts : list
+        The parsed (and simplified) AST of every formula in formulas with the number of
+        nodes it added to parsed and removed, None until it is needed
     asp_file : str
         The name of the .lp file
     dot_file : str
@@ -43,12 +274,20 @@ class GOLOGToASP:
     -------
     get_name(op, type="gst")
         Returns name of given operator
+    intern_formula(match)
+        Stores a fluent formula once and returns its placeholder in the Golog program
+    get_formula(atom)
+        Returns the fluent formula of a placeholder
+    substitute(pattern, repl, prog, origin)
+        Replaces all matches of a pattern and keeps the positions in the entered program
     get_workable_prog(type="gst", exp=None)
-        Prepares the entered Golog program for the generation of the abstract syntax tree
-    get_ast_node(op_stack, output_stack, type="gst")
-        Returns an abstract syntax tree node
+        Splits the entered Golog program into tokens for the generation of the abstract syntax tree
+    get_ast_node(ast, token, output_stack, type="gst")
+        Adds an operator node to the abstract syntax tree and returns its id
     get_ast(type="gst", exp=None)
         Generates and returns the abstract syntax tree representing the entered Golog program
+    simplify_ast(ast, type="gst")
+        Returns a simplified copy of an abstract syntax tree
     extract_clause(string)
         Filters and returns the head and body of an ASP clause inside the entered Golog program
     print_formula_to_asp(file, ast, id)
@@ -67,19 +306,35 @@ class GOLOGToASP:
         "gst": ["or", "seq", "star", "plus", "test"],
         "fst": ["or", "and", "neg"]
     }
+    associative = {
+        "gst": ["or", "seq"],
+        "fst": ["or", "and"]
+    }
+    prefix = {
+        "gst": "",
+        "fst": "~"
+    }
+    postfix = {
+        "gst": "*?",
+        "fst": ""
+    }
+    # token types
+    ATOM, OPERATOR, OPEN, CLOSE = range(4)
+    # brackets and operators are single characters, everything in between is an atom
+    tokens = {
+        "gst": compile(r"[\[\];|*?]|[^\[\];|*?]+"),
+        "fst": compile(r"[\[\]&+~]|[^\[\]&+~]+")
+    }
     prog = ""
-    ast = []
     gst_template = {
         "atom variables": "gst({}, {}) :- {}.\n",
         "atom": "gst({}, {}).\n",
-        "node single": "gst({}, {}({})).\n",
-        "node double": "gst({}, {}({},{})).\n"
+        "node": "gst({}, {}({})).\n"
     }
     fst_template = {
         "atom variables": "fst({}, {}, {}) :- {}.\n",
         "atom": "fst({}, {}, {}).\n",
-        "node single": "fst({}, {}, {}({})).\n",
-        "node double": "fst({}, {}, {}({},{})).\n"
+        "node": "fst({}, {}, {}({})).\n"
     }
     dot_template = {
         "start": "graph gst {\ngraph [fontname = \"arial\"];\nnode [fontname = \"arial\"];\nedge [fontname = \"arial\"];",
@@ -87,19 +342,37 @@ class GOLOGToASP:
         "node": "{} [label=\"{} | {}\" shape=record style=rounded penwidth=2];\n{} -- {};\n",
         "end": "}"
     }
-    formulas = {}
+    formula_pattern = compile(r'#([a-zA-Z_\(\)\{\}0-9+\-\*=!&~\[\],\s]+)#\?')
     asp_file = "gst.lp"
     dot_file = "gst.dot"
 
-    def __init__(self, prog):
+    def __init__(self, prog, dag=False, simplify=False):
         """
         Parameters
         ----------
         prog : str
             Golog program from command line
+        dag : bool, optional
+            Emits structurally identical subprograms and subformulas only once,
+            all occurrences refer to the same node (default is False)
+        simplify : bool, optional
+            Simplifies the Golog program and the formulas before they are written,
+            see simplify_ast (default is False)
         """
 
         self.prog = prog
+        self.dag = dag
+        self.simplify = simplify
+        self.parsed = 0
+        self.removed = 0
+        self.ast = None
+        self.formulas = []
+        self.formula_ids = {}
+        self.formula_asts = []
+        self.operators = dict(
+            (type, dict((op, (i, self.names[type][i])) for i, op in enumerate(ops)))
+            for type, ops in self.precedence.items()
+        )
 
     def get_name(self, op, type="gst"):
         """
@@ -120,11 +393,101 @@ class GOLOGToASP:
             The name of the given operator
         """
 
-        return self.names[type][self.precedence[type].index(op)]
+        return self.operators[type][op][1]
+
+    def intern_formula(self, match):
+        """
+        Stores the fluent formula of a match once and replaces it by a placeholder
+        holding its id, e.g. #0#?
+
+        Parameters
+        ----------
+        match : Match
+            Match of formula_pattern
+
+        Returns
+        -------
+        str
+            The placeholder, followed by the test operator
+        """
+
+        formula = match.group(1)
+        id = self.formula_ids.get(formula)
+
+        # no doublets allowed
+        if id is None:
+            id = len(self.formulas)
+            self.formula_ids[formula] = id
+            self.formulas.append(formula)
+            self.formula_asts.append(None)
+
+        return "#{}#?".format(id)
+
+    def get_formula(self, atom):
+        """
+        Returns the fluent formula an atom of the Golog program stands for
+
+        Parameters
+        ----------
+        atom : str
+            An atom of the AST
+
+        Returns
+        -------
+        str
+            The fluent formula or None if the atom is no placeholder
+        """
+
+        if len(atom) > 2 and atom[0] == "#" and atom[-1] == "#" and atom[1:-1].isdigit():
+            return self.formulas[int(atom[1:-1])]
+
+        return None
+
+    def substitute(self, pattern, repl, prog, origin):
+        """
+        Replaces all matches of a pattern like re.sub and keeps track of the position
+        of every character in the entered program
+
+        Parameters
+        ----------
+        pattern : Pattern
+            The compiled pattern
+        repl : str or callable
+            The replacement or a function returning the replacement of a match
+        prog : str
+            The (partly processed) Golog program
+        origin : sequence
+            Position of every character of prog in the entered program
+
+        Returns
+        -------
+        str, list
+            The processed program and the position of every character in the entered
+            program, a replacement refers to the start of its match
+        """
+
+        parts = []
+        positions = []
+        last = 0
+
+        for m in pattern.finditer(prog):
+            text = repl(m) if callable(repl) else repl
+
+            parts.append(prog[last:m.start()])
+            parts.append(text)
+            positions.extend(origin[last:m.start()])
+            positions.extend([origin[m.start()]] * len(text))
+            last = m.end()
+
+        parts.append(prog[last:])
+        positions.extend(origin[last:])
+
+        return "".join(parts), positions
 
     def get_workable_prog(self, type="gst", exp=None):
         """
-        Prepares the entered Golog program for further processing
+        Splits the entered Golog program (or a fluent formula) into tokens in a
+        single pass
 
         Parameters
         ----------
@@ -138,95 +501,84 @@ class GOLOGToASP:
         Returns
         -------
         list
-            The entered and prepared Golog program as a list for further processing
+            The tokens as (type, text, position) tuples, the position refers to the
+            entered program respectively to the formula
         """
 
         prog = ""
+        origin = None
 
         if type == "gst":
             prog = self.prog
-            prog = prog.replace(" ", "")
+            origin = range(len(prog))
+            prog, origin = self.substitute(compile(" "), "", prog, origin)
             # remove ASP style comments
-            prog = sub(r'%[a-zA-Z0-9\-_:;\.,\s\{\}\(\)\*\+\-\&~]+\n', "", prog)
-            prog = prog.replace("\n", "")
-            prog = prog.replace("\r", "")
-            prog = prog.replace("\t", "")
-
-            # filter fluent formulas
-            matches = finditer('#[a-zA-Z_\(\)\{\}0-9+\-\*=!&~\[\],\s]+#\?', prog)
-
-            try:
-                # replace fluent formula in Golog program to prevent problems
-                # with further processing (formulas are handled separately) 
-                while True:
-                    m = next(matches)
-                    saved = False
-
-                    m.group()[1:-2]
-
-                    for key, value in self.formulas.items():
-                        if m.group()[1:-2] == value:
-                            saved = True
-                            break
-
-                    # no doublets allowed
-                    if not saved:
-                        self.formulas[m.span()[0]+1] = m.group()[1:-2]
-                        
-                        prog = prog.replace(m.group()[:-1], str(m.span()[0]+1))
-            except StopIteration:
-                pass
-
-            # make prog splittable
-            prog = prog.replace(";", " ; ")
-            prog = prog.replace("|", " | ")
-            prog = prog.replace("[", " [ ")
-            prog = prog.replace("]", " ] ")
-            prog = prog.replace("*", " * nil ")
-            prog = prog.replace("?", " ? nil ")
+            prog, origin = self.substitute(compile(r'%[a-zA-Z0-9\-_:;\.,\s\{\}\(\)\*\+\-\&~]+\n'), "", prog, origin)
+            prog, origin = self.substitute(compile(r'[\n\r\t]'), "", prog, origin)
+
+            # replace fluent formulas in Golog program to prevent problems
+            # with further processing (formulas are handled separately)
+            prog, origin = self.substitute(self.formula_pattern, self.intern_formula, prog, origin)
+
         elif type == "fst" and exp != None:
             prog = exp
-            prog = prog.replace("[", " [ ")
-            prog = prog.replace("]", " ] ")
-            prog = prog.replace("&", " & ")
-            prog = prog.replace("+", " + ")
-            prog = prog.replace("~", "nil ~ ")
 
-            if prog[0] == "[":
-                prog = prog[1:]
-            if prog[-1] == "]":
-                prog = prog[:-1]
+        operators = self.operators[type]
+        tokens = []
 
-        prog = prog.replace("  ", " ")
-        prog = prog.strip()
-        prog = prog.split(" ")
+        for m in self.tokens[type].finditer(prog):
+            text = m.group()
+            position = m.start() if origin is None else origin[m.start()]
 
-        return prog
+            if text == "[":
+                tokens.append((self.OPEN, text, position))
+            elif text == "]":
+                tokens.append((self.CLOSE, text, position))
+            elif text in operators:
+                tokens.append((self.OPERATOR, text, position))
+            else:
+                tokens.append((self.ATOM, text, position))
 
+        # an empty program is a single empty atom
+        if len(tokens) == 0:
+            tokens.append((self.ATOM, "", 0))
 
-    def get_ast_node(self, op_stack, output_stack, type="gst"):
+        return tokens
+
+    def get_ast_node(self, ast, token, output_stack, type="gst"):
         """
-        Creates an AST node represented as a three tuple
+        Adds an operator node to the AST, its operands are taken from the output stack
         
         Parameters
         ----------
-        op_stack : list
-            The operator stack (Shunting Yard)
+        ast : AST
+            The abstract syntax tree
+        token : tuple
+            The operator token
         output_stack : list
-            The output stack (Shunting Yard)
+            The output stack (Shunting Yard), holds node ids
         type : str, optional
-            Used to determine where to look for the operator name (default is gst)
+            Used to determine the operator (default is gst)
             gst: Golog operators
             fst: logical operators
+
+        Returns
+        -------
+        int
+            The id of the new node
         """
 
-        right = output_stack.pop()
-        left = output_stack.pop()
-        label = self.get_name(op_stack.pop(), type=type)
+        kind, op, position = token
+        arity = 1 if op in self.prefix[type] or op in self.postfix[type] else 2
 
-        return (left, label, right)
+        if len(output_stack) < arity:
+            raise ValueError("Missing operand of %s at position %d" % (op, position))
+
+        children = output_stack[-arity:]
+        del output_stack[-arity:]
+
+        return ast.add_node(self.operators[type][op][0], children)
 
-    
     def get_ast(self, type="gst", exp=None):
         """
         Creates abstract syntax trees for Golog programs and fluent formulas based on Dijkstra's 
@@ -243,54 +595,225 @@ class GOLOGToASP:
 
         Returns
         -------
-        list
+        AST
             If type is gst the whole AST of the entered Golog program is returned, otherwise
-            the AST of the given fluent formula
+            the AST of the given fluent formula; formulas of the program are parsed once
         """
-        if len(self.ast) == 0 or type == "fst":
+        id = self.formula_ids.get(exp) if type == "fst" else None
+
+        if id is not None and self.formula_asts[id] is not None:
+            ast, parsed, removed = self.formula_asts[id]
+            # every occurrence is written, so it counts like a parsed one
+            self.parsed += parsed
+            self.removed += removed
+
+            return ast
+
+        if self.ast is None or type == "fst":
             if type == "gst":
                 prog = self.get_workable_prog(type=type)
             elif type == "fst" and exp != None:
                 prog = self.get_workable_prog(type=type, exp=exp)
 
+            operators = self.operators[type]
+            ast = AST(self.dag)
             op_stack = []
             output_stack = []
 
-            for c in prog:
-                # If it's a number add it to queue
-                if not (c in self.precedence[type]) and c != "[" and c != "]":
-                    output_stack.append((None,c,None))
-                if c == "[":
-                    op_stack.append(c)
-                if c == "]":
-                    while op_stack[-1] != "[" and len(op_stack) > 0:
-                        output_stack.append(self.get_ast_node(op_stack, output_stack, type))
-                    
-                    op_stack.pop()
-                # If it's an operator
-                if c in self.precedence[type]:
+            for token in prog:
+                kind, c, position = token
+
+                # atoms go to the output
+                if kind == self.ATOM:
+                    output_stack.append(ast.add_atom(c))
+                elif kind == self.OPEN:
+                    op_stack.append(token)
+                elif kind == self.CLOSE:
+                    while len(op_stack) > 0 and op_stack[-1][0] != self.OPEN:
+                        output_stack.append(self.get_ast_node(ast, op_stack.pop(), output_stack, type))
+
                     if len(op_stack) == 0:
-                        op_stack.append(c)
+                        raise ValueError("Unmatched ] at position %d" % position)
+
+                    op_stack.pop()
+                elif c in self.prefix[type]:
+                    # the operand follows
+                    op_stack.append(token)
+                else:
+                    rank = operators[c][0]
+
+                    while len(op_stack) > 0 \
+                        and op_stack[-1][0] == self.OPERATOR \
+                        and rank < operators[op_stack[-1][1]][0]:
+
+                        output_stack.append(self.get_ast_node(ast, op_stack.pop(), output_stack, type))
+
+                    # the operand is complete
+                    if c in self.postfix[type]:
+                        output_stack.append(self.get_ast_node(ast, token, output_stack, type))
                     else:
-                        while len(op_stack) > 0 \
-                            and op_stack[-1] in self.precedence[type] \
-                            and self.precedence[type].index(c) < self.precedence[type].index(op_stack[-1]):
-                            
-                            output_stack.append(self.get_ast_node(op_stack, output_stack, type))
-                        
-                        op_stack.append(c)
+                        op_stack.append(token)
             
             # just put the rest on the output stack
             while len(op_stack) > 0:
-                output_stack.append(self.get_ast_node(op_stack, output_stack, type))
+                if op_stack[-1][0] == self.OPEN:
+                    raise ValueError("Unmatched [ at position %d" % op_stack[-1][2])
+
+                output_stack.append(self.get_ast_node(ast, op_stack.pop(), output_stack, type))
+
+            # e.g. only brackets
+            if len(output_stack) == 0:
+                raise ValueError("Empty {}".format("program" if type == "gst" else "formula"))
+
+            ast.root = output_stack[0]
+
+            parsed, removed = self.parsed, self.removed
+
+            if self.simplify:
+                ast = self.simplify_ast(ast, type)
+
+            if id is not None:
+                self.formula_asts[id] = (ast, self.parsed - parsed, self.removed - removed)
 
             if type == "gst":
-                self.ast = output_stack
+                self.ast = ast
         
         if type == "gst":
             return self.ast
         else:
-            return output_stack
+            return ast
+
+    def simplify_ast(self, ast, type="gst"):
+        """
+        Returns a simplified copy of an AST. The rewrites preserve the semantics:
+        nested or/seq (and/or in formulas) are merged into one node with many
+        children, duplicate alternatives (operands) of or/and are removed, a
+        star of a star and a test or star directly repeated in a sequence are
+        collapsed and double negations are removed. The number of parsed and
+        removed nodes is added to parsed and removed
+
+        Parameters
+        ----------
+        ast : AST
+            The abstract syntax tree
+        type : str, optional
+            Used to determine the operators (default is gst)
+            gst: Golog operators
+            fst: logical operators
+
+        Returns
+        -------
+        AST
+            The simplified abstract syntax tree
+        """
+
+        names = self.names[type]
+        associative = [names.index(name) for name in self.associative[type]]
+        idempotent = [names.index(name) for name in ("or", "and") if name in names]
+        star = names.index("star") if "star" in names else None
+        neg = names.index("neg") if "neg" in names else None
+        repeatable = [names.index(name) for name in ("star", "test") if name in names]
+
+        # nodes of an or/seq (and/or) chain below its top are merged into the top
+        parents = array("l", [0]) * len(ast)
+        same = array("l", [0]) * len(ast)
+
+        for node in range(len(ast)):
+            for child in ast.get_children(node):
+                parents[child] += 1
+
+                if ast.opcodes[child] == ast.opcodes[node]:
+                    same[child] += 1
+
+        absorbed = [
+            ast.opcodes[node] in associative and parents[node] == same[node] > 0 and node != ast.root
+            for node in range(len(ast))
+        ]
+
+        simplified = AST(self.dag)
+        # structurally identical subtrees have the same class
+        classes = {}
+        node_class = {}
+        # children are always added before their parents, so the nodes can be
+        # rewritten in order of their ids
+        new = array("l", [-1]) * len(ast)
+
+        for node in range(len(ast)):
+            opcode = ast.opcodes[node]
+
+            if absorbed[node]:
+                continue
+            elif opcode == ast.ATOM:
+                new[node] = simplified.add_atom(ast.get_label(node))
+                key = (opcode, ast.get_label(node))
+            else:
+                children = []
+                stack = list(reversed(ast.get_children(node)))
+
+                # operands of the whole chain in order
+                while len(stack) > 0:
+                    child = stack.pop()
+
+                    if absorbed[child]:
+                        stack.extend(reversed(ast.get_children(child)))
+                    else:
+                        children.append(new[child])
+
+                if opcode in associative:
+                    flat = []
+
+                    # operands that became the same operator by other rewrites
+                    for child in children:
+                        if simplified.opcodes[child] == opcode:
+                            flat.extend(simplified.get_children(child))
+                        else:
+                            flat.append(child)
+
+                    children = flat
+
+                if opcode in idempotent:
+                    seen = set()
+                    unique = []
+
+                    for child in children:
+                        if node_class[child] not in seen:
+                            seen.add(node_class[child])
+                            unique.append(child)
+
+                    children = unique
+                elif opcode in associative:
+                    # seq: a test or star directly followed by itself
+                    children = [
+                        child for i, child in enumerate(children)
+                        if i == 0 or node_class[child] != node_class[children[i - 1]]
+                        or simplified.opcodes[child] not in repeatable
+                    ]
+
+                child = children[0]
+
+                if len(children) == 1 and opcode in associative:
+                    new[node] = child
+                elif opcode == star and simplified.opcodes[child] == star:
+                    new[node] = child
+                elif opcode == neg and simplified.opcodes[child] == neg:
+                    new[node] = simplified.get_children(child)[0]
+                else:
+                    new[node] = simplified.add_node(opcode, children)
+
+                key = (simplified.opcodes[new[node]],) + tuple(
+                    node_class[child] for child in simplified.get_children(new[node])
+                )
+
+            if new[node] not in node_class:
+                node_class[new[node]] = classes.setdefault(key, len(classes))
+
+        simplified.root = new[ast.root]
+
+        parsed = len(ast.breadth_first()[0])
+        self.parsed += parsed
+        self.removed += parsed - len(simplified.breadth_first()[0])
+
+        return simplified
 
     def extract_clause(self, string):
         """
@@ -337,25 +860,22 @@ class GOLOGToASP:
         ----------
         file : IO
             The object of the output file
-        ast : list
+        ast : AST
             The abstract syntax tree of the fluent formula
         id : int
             The ID of the formula AST
         """
-        queue = ast
+        names = self.names["fst"]
+        order, numbers = ast.breadth_first()
 
         file.write("\n")
 
-        i = 0
-        j = 0
-        while len(queue) > 0:
-            node = queue.pop(0)
-            el = node[1]
+        for i, node in enumerate(order):
+            children = [numbers[child] for child in ast.get_children(node)]
 
-            if el == "nil":
-                continue
             # atom?
-            if not (el in self.names["fst"]):
+            if ast.opcodes[node] == ast.ATOM:
+                el = ast.get_label(node)
                 head, body = self.extract_clause(el)
 
                 if head != None:
@@ -363,22 +883,9 @@ class GOLOGToASP:
                 else:
                     file.write(self.fst_template["atom"].format(id, i, el))
             else: # operator!
-                if el == "neg":
-                    index = j+1
-                    j = index
-                    file.write(self.fst_template["node single"].format(id, i, el, index))
-                else:
-                    index1 = j+1
-                    index2 = index1+1
-                    j = index2
-                    file.write(self.fst_template["node double"].format(id, i, el, index1, index2))
-            
-            if node[0] != None:
-                queue.append(node[0])
-            if node[2] != None:
-                queue.append(node[2])
+                el = names[ast.opcodes[node]]
 
-            i += 1
+                file.write(self.fst_template["node"].format(id, i, el, ",".join(map(str, children))))
 
         file.write("\n")
 
@@ -395,52 +902,40 @@ class GOLOGToASP:
         """
         f = open(self.asp_file, 'w')
 
-        queue = []
-
-        node = self.get_ast()[0]
-        queue.append(node)
+        ast = self.get_ast()
+        names = self.names[type]
+        order, numbers = ast.breadth_first()
 
         f.write("%*\n{}\n*%\n".format(self.prog))
 
-        i = 0
-        j = 0
-        while len(queue) > 0:
-            node = queue.pop(0)
-            el = node[1]
+        for i, node in enumerate(order):
+            children = [numbers[child] for child in ast.get_children(node)]
 
-            if el == "nil":
-                continue
             # atom?
-            if not (el in self.names[type]):
-                head, body = self.extract_clause(node[1])
+            if ast.opcodes[node] == ast.ATOM:
+                el = ast.get_label(node)
+                head, body = self.extract_clause(el)
 
                 if head != None:
                     f.write(self.gst_template["atom variables"].format(i, head, body))
                 else:
+                    formula = self.get_formula(el)
+
                     # fluent formula?
-                    try:
-                        fre_ast = self.get_ast(type="fst", exp=self.formulas[int(el)])
+                    if formula != None:
+                        try:
+                            fre_ast = self.get_ast(type="fst", exp=formula)
+                        except ValueError as e:
+                            # positions of formulas refer to the formula
+                            raise ValueError("{} of formula {}".format(e, formula))
 
                         self.print_formula_to_asp(f, fre_ast, i)
-                    except:
+                    else:
                         f.write(self.gst_template["atom"].format(i, el))
             else: # operator!
-                if el == "star" or el == "test":
-                    index = j+1
-                    j = index
-                    f.write(self.gst_template["node single"].format(i, el, index))
-                else:
-                    index1 = j+1
-                    index2 = index1+1
-                    j = index2
-                    f.write(self.gst_template["node double"].format(i, el, index1, index2))
-            
-            if node[0] != None:
-                queue.append(node[0])
-            if node[2] != None:
-                queue.append(node[2])
+                el = names[ast.opcodes[node]]
 
-            i += 1
+                f.write(self.gst_template["node"].format(i, el, ",".join(map(str, children))))
 
         f.close()
 
@@ -456,25 +951,23 @@ class GOLOGToASP:
             (default is gst)
         """
         f = open(self.dot_file, 'w')
-        queue = []
 
-        node = self.get_ast()[0]
-        queue.append(node)
+        ast = self.get_ast()
+        names = self.names[type]
+        order, numbers = ast.breadth_first()
 
         f.write(self.dot_template["start"])
 
-        i = 0
-        j = 0
-        while len(queue) > 0:
-            node = queue.pop(0)
-            el = node[1]
+        for i, node in enumerate(order):
+            children = [numbers[child] for child in ast.get_children(node)]
 
-            if el == "nil":
-                continue
             # atom?
-            if not (el in self.names[type]):
-                try:
-                    el = self.formulas[int(el)]
+            if ast.opcodes[node] == ast.ATOM:
+                el = ast.get_label(node)
+                formula = self.get_formula(el)
+
+                if formula != None:
+                    el = formula
 
                     head, body = self.extract_clause(el)
                     if head == None:
@@ -484,33 +977,19 @@ class GOLOGToASP:
                         head = head[1:]
                     if head[-1] == "]":
                         head = head[:-1]
-                except:
-                    head, body = self.extract_clause(node[1])
+                else:
+                    head, body = self.extract_clause(el)
 
                 if head != None:
                     f.write(self.dot_template["leaf"].format(i, i, head, i))
                 else:
                     f.write(self.dot_template["leaf"].format(i, i, el, i))
             else: # operator!
-                if el == "star" or el == "test":
-                    index = j+1
-                    j = index
-
-                    f.write(self.dot_template["node"].format(i, i, el.upper(), i, index))
-                else:
-                    index1 = j+1
-                    index2 = index1+1
-                    j = index2
+                el = names[ast.opcodes[node]]
 
-                    f.write(self.dot_template["node"].format(i, i, el.upper(), i, index1))
-                    f.write(self.dot_template["node"].format(i, i, el.upper(), i, index2))
-            
-            if node[0] != None:
-                queue.append(node[0])
-            if node[2] != None:
-                queue.append(node[2])
-
-            i += 1
+                # one edge per child
+                for child in children:
+                    f.write(self.dot_template["node"].format(i, i, el.upper(), i, child))
 
         f.write(self.dot_template["end"])
 
@@ -519,12 +998,25 @@ class GOLOGToASP:
         call(["dot", "-Tpng", self.dot_file, "-O"])
     
 def main():
-    if len(argv) < 2:
-        raise RuntimeError("No Golog expression specified. Syntax is: Python3 golog-to-asp.py \"[GOLOG_PROGRAM]\"")
-    else:
-        encoder = GOLOGToASP(argv[1])
+    parser = ArgumentParser(description="Translates a Golog program to ASP (gst.lp) and Dot (gst.dot, gst.dot.png)")
+    parser.add_argument("program", metavar="GOLOG_PROGRAM")
+    parser.add_argument("--dag", action="store_true",
+        help="emit structurally identical subprograms and subformulas once and refer to them by node id")
+    parser.add_argument("--simplify", action="store_true",
+        help="flatten or/seq (and/or) chains, remove duplicate alternatives, nested stars and double negations")
+    args = parser.parse_args()
+
+    encoder = GOLOGToASP(args.program, dag=args.dag, simplify=args.simplify)
+
+    try:
         encoder.print_to_asp()
-        encoder.print_to_dot()
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.simplify:
+        print("Simplification removed {} of {} nodes".format(encoder.removed, encoder.parsed))
+
+    encoder.print_to_dot()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,140 +1,1391 @@
 #!/usr/local/bin/python3
 
-from sys import stdin, argv
-from re import findall
-from json import loads
+from argparse import ArgumentParser, ArgumentTypeError
+from sys import stdin, stdout
+from re import compile, error
+from json import loads, JSONDecoder, JSONDecodeError
 from time import time
+from codecs import getincrementaldecoder
+from array import array
+from collections import deque
+from itertools import islice, chain
+from glob import glob
+from os import makedirs, remove
+from os.path import commonpath, dirname, isdir, isfile, join, relpath, splitext
+from multiprocessing import Pool
+from signal import signal, SIGINT, SIG_IGN
+from sqlite3 import connect
+from hashlib import blake2b
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+from sys import byteorder
+
+class ClingoOutputStream:
+    """
+    Incremental parser for clingo output in JSON format. The output is read in
+    chunks and the witnesses are decoded one at a time as soon as they are
+    complete, so memory is bounded by the largest single witness. Everything
+    written by clingo after the witnesses (result, number of models, time) is
+    available once all witnesses have been read
+
+    Attributes
+    ----------
+    stream : IO
+        The clingo output, e.g. stdin
+    chunk_size : int
+        Number of characters read at once
+    clingo_input : list
+        The input files of clingo
+    result : str
+        The result of clingo, e.g. SATISFIABLE
+    num_results : int
+        The number of models found by clingo
+    time : dict
+        The times needed by clingo, including the derived grounding time
+
+    Methods
+    -------
+    witnesses(raw=False, selected=None)
+        Yields the witnesses of the first call one at a time
+    skip_witness(start)
+        Returns the end of a witness without decoding it
+    """
+
+    chunk_size = 65536
+    witnesses_key = compile(r'(?<!\\)"Witnesses"\s*:\s*\[')
+    separator = compile(r'[\s,]*')
+    # everything up to the next bracket or brace outside of strings
+    no_brackets = compile(r'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*')
+    decoder = JSONDecoder()
+
+    def __init__(self, stream):
+        """
+        Parameters
+        ----------
+        stream : IO
+            The clingo output, e.g. stdin
+        """
+
+        self.stream = stream
+        self.raw = getattr(stream, "buffer", None)
+        self.decoder_utf8 = getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.offset = 0
+        self.clingo_input = []
+        self.result = ""
+        self.num_results = 0
+        self.time = {}
+
+    def read(self, until=None):
+        """
+        Appends the next chunks of the stream to the buffer and drops the part
+        of the buffer before offset. The chunks are joined once, so reading a
+        long witness is linear in its size
+
+        Parameters
+        ----------
+        until : str, optional
+            Keep reading until a chunk contains this character, e.g. the closing
+            brace of a witness (default is None, i.e. read one chunk)
+
+        Returns
+        -------
+        bool
+            False if the end of the stream has been reached
+        """
+
+        chunks = [self.buffer[self.offset:]]
+
+        while True:
+            if self.raw is not None:
+                # read1 returns what is available instead of waiting for a full chunk
+                data = self.raw.read1(self.chunk_size)
+                chunk = self.decoder_utf8.decode(data, final=data == b"")
+            else:
+                data = chunk = self.stream.read(self.chunk_size)
+
+            chunks.append(chunk)
+
+            if len(data) == 0 or until is None or until in chunk:
+                break
+
+        self.buffer = "".join(chunks)
+        self.offset = 0
+
+        return len(data) != 0
+
+    def find_value(self, text, key, default):
+        """
+        Decodes the value of the first occurrence of a key in (a part of) the output
+
+        Parameters
+        ----------
+        text : str
+            Part of the clingo output
+        key : str
+            The JSON key
+        default : object
+            Returned if the key is not found
+
+        Returns
+        -------
+        object
+            The decoded value
+        """
+
+        match = compile(r'"%s"\s*:\s*' % key).search(text)
+
+        if match is None:
+            return default
+
+        return self.decoder.raw_decode(text, match.end())[0]
+
+    def read_summary(self, text):
+        """
+        Reads result, number of models and time from the end of the output
+
+        Parameters
+        ----------
+        text : str
+            The output after the witnesses
+        """
+
+        self.result = self.find_value(text, "Result", "")
+        self.num_results = self.find_value(text, "Models", {}).get("Number", 0)
+        self.time = self.find_value(text, "Time", {})
+
+        if "Total" in self.time and "Solve" in self.time:
+            self.time["Grounding"] = self.time["Total"] - self.time["Solve"]
+
+    def skip_witness(self, start):
+        """
+        Finds the end of the witness starting at start in the buffer without
+        decoding it
+
+        Parameters
+        ----------
+        start : int
+            Position of the opening brace of the witness in the buffer
+
+        Returns
+        -------
+        int
+            Position after the closing brace of the witness
+
+        Raises
+        ------
+        JSONDecodeError
+            If the witness is not complete in the buffer
+        """
+
+        end = self.buffer.find("}", start)
+
+        # a closing brace inside a string is preceded by an odd number of quotes
+        while end >= 0 and self.buffer.count('"', start, end) % 2 == 1:
+            end = self.buffer.find("}", end + 1)
+
+        # without escaped characters and nested objects this is the closing brace of the witness
+        if end >= 0 and self.buffer.find("\\", start, end) < 0 and self.buffer.find("{", start + 1, end) < 0:
+            return end + 1
+
+        # otherwise match the brackets and braces outside of strings
+        depth = 0
+        end = start
+
+        while True:
+            end = self.no_brackets.match(self.buffer, end).end()
+
+            # the end of the buffer or inside a string that is not complete yet
+            if end == len(self.buffer) or self.buffer[end] == '"':
+                raise JSONDecodeError("Unterminated witness", self.buffer, start)
+
+            depth += 1 if self.buffer[end] in "[{" else -1
+            end += 1
+
+            if depth == 0:
+                return end
+
+    def witnesses(self, raw=False, selected=None):
+        """
+        Yields the witnesses of the first call one at a time
+
+        Parameters
+        ----------
+        raw : bool, optional
+            Yield the JSON text of the witnesses instead of decoding them, e.g. to
+            decode them in another process (default is False)
+        selected : callable, optional
+            Called with the number of every witness, starting at 1; witnesses it
+            returns False for are skipped without being decoded (default is None,
+            i.e. all witnesses are yielded)
+
+        Yields
+        ------
+        int, dict
+            Number of the witness and the decoded witness, e.g.
+            (1, {"Value": ["occurs(a,0)", "holds(b,1)"]})
+        """
+
+        if self.buffer is None:
+            # the output has been read completely
+            return
+
+        match = self.witnesses_key.search(self.buffer)
+
+        while match is None:
+            if not self.read():
+                # no witnesses at all, e.g. unsatisfiable
+                self.clingo_input = self.find_value(self.buffer, "Input", [])
+                self.read_summary(self.buffer)
+                self.buffer = None
+                return
+
+            match = self.witnesses_key.search(self.buffer)
+
+        self.clingo_input = self.find_value(self.buffer[:match.start()], "Input", [])
+        # the consumed part of the buffer is dropped by the next read
+        self.offset = match.end()
+        index = 1
+
+        while True:
+            start = self.separator.match(self.buffer, self.offset).end()
+
+            if start == len(self.buffer):
+                if not self.read():
+                    raise ValueError("Unexpected end of clingo output")
+                continue
+
+            if self.buffer[start] == "]":
+                break
+
+            wanted = selected is None or selected(index)
+
+            try:
+                if wanted and not raw:
+                    witness, end = self.decoder.raw_decode(self.buffer, start)
+                else:
+                    # raw and skipped witnesses are never decoded
+                    end = self.skip_witness(start)
+            except JSONDecodeError:
+                # a witness is complete only once a closing brace has been read
+                self.offset = start
+
+                if not self.read("}"):
+                    raise ValueError("Unexpected end of clingo output")
+
+                continue
+
+            if wanted:
+                yield index, self.buffer[start:end] if raw else witness
+
+            self.offset = end
+            index += 1
+
+        # the rest of the output is small
+        self.offset = start + 1
+
+        while self.read():
+            pass
+
+        self.read_summary(self.buffer)
+        self.buffer = None
+
+class SymbolTable:
+    """
+    Interns terms, i.e. every distinct term is stored once and referred to by its id
+
+    Attributes
+    ----------
+    ids : dict
+        Id of every term
+    names : list
+        Term of every id
+
+    Methods
+    -------
+    intern(name)
+        Returns the id of a term, adding it if it is new
+    """
+
+    __slots__ = ("ids", "names")
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        """
+        Returns the id of a term, adding it if it is new
+
+        Parameters
+        ----------
+        name : str
+            The term, e.g. move(r1,10)
+
+        Returns
+        -------
+        int
+            The id of the term
+        """
+
+        symbol = self.ids.get(name)
+
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+
+        return symbol
+
+class Model:
+    """
+    Actions and fluents of one model as ids of a SymbolTable. The ids of all
+    timesteps are stored in one array each, the ids of the i-th timestep are
+    atoms[start[i]:start[i + 1]], sorted by id
+
+    Attributes
+    ----------
+    index : int
+        Number of the model, starting at 1
+    timesteps : array
+        All timesteps with actions or fluents in ascending order
+    action_start : array
+        Start of the actions of every timestep in action_atoms
+    action_atoms : array
+        The actions of all timesteps
+    fluent_start : array
+        Start of the fluents of every timestep in fluent_atoms
+    fluent_atoms : array
+        The fluents of all timesteps
+
+    Methods
+    -------
+    actions(i)
+        Returns the actions of the i-th timestep
+    fluents(i)
+        Returns the fluents of the i-th timestep
+    """
+
+    __slots__ = ("index", "timesteps", "action_start", "action_atoms", "fluent_start", "fluent_atoms")
+
+    def __init__(self, index, actions, fluents):
+        """
+        Parameters
+        ----------
+        index : int
+            Number of the model, starting at 1
+        actions : dict
+            Ids of the actions per timestep
+        fluents : dict
+            Ids of the fluents per timestep
+        """
+
+        self.index = index
+        self.timesteps = array("I", sorted(set(actions) | set(fluents)))
+        self.action_start, self.action_atoms = self.pack(actions)
+        self.fluent_start, self.fluent_atoms = self.pack(fluents)
+
+    def pack(self, atoms):
+        """
+        Stores the ids of all timesteps in one array
+
+        Parameters
+        ----------
+        atoms : dict
+            Ids per timestep
+
+        Returns
+        -------
+        array, array
+            Start of every timestep and the sorted ids
+        """
+
+        start = array("I", [0])
+        packed = array("I")
+
+        for timestep in self.timesteps:
+            packed.extend(sorted(atoms.get(timestep, ())))
+            start.append(len(packed))
+
+        return start, packed
+
+    def actions(self, i):
+        """
+        Returns the actions of the i-th timestep
+
+        Parameters
+        ----------
+        i : int
+            Position of the timestep in timesteps
+
+        Returns
+        -------
+        array
+            Sorted ids of the actions
+        """
+
+        return self.action_atoms[self.action_start[i]:self.action_start[i + 1]]
+
+    def fluents(self, i):
+        """
+        Returns the fluents of the i-th timestep
+
+        Parameters
+        ----------
+        i : int
+            Position of the timestep in timesteps
+
+        Returns
+        -------
+        array
+            Sorted ids of the fluents
+        """
+
+        return self.fluent_atoms[self.fluent_start[i]:self.fluent_start[i + 1]]
+
+class ModelIndex:
+    """
+    Inverted index of the atoms of all models in a SQLite database, i.e. the
+    models an atom occurs in at a timestep can be looked up without parsing the
+    clingo output again (see query-index.py)
+
+    Attributes
+    ----------
+    db : Connection
+        The SQLite database
+    symbol_count : int
+        Number of terms already stored
+    schema : str
+        Tables of the database; predicate is 0 for occurs and 1 for holds
+    indexes : str
+        Indexes of the database, created after all atoms have been stored
+
+    Methods
+    -------
+    add(model, symbols)
+        Stores the atoms of a model
+    close()
+        Commits and closes the database
+    """
+
+    schema = """
+CREATE TABLE IF NOT EXISTS symbols (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS atoms (model INTEGER, timestep INTEGER, predicate INTEGER, symbol INTEGER);
+DROP INDEX IF EXISTS symbols_name;
+DROP INDEX IF EXISTS atoms_symbol;
+DROP INDEX IF EXISTS atoms_model;
+"""
+    indexes = """
+CREATE INDEX symbols_name ON symbols (name);
+CREATE INDEX atoms_symbol ON atoms (symbol, timestep, predicate);
+CREATE INDEX atoms_model ON atoms (model, timestep);
+"""
+
+    def __init__(self, db_file_path):
+        """
+        Parameters
+        ----------
+        db_file_path : str
+            Path to the SQLite database, created if it does not exist and emptied
+            if it does
+        """
+
+        self.db = connect(db_file_path)
+        self.db.executescript(self.schema)
+        self.db.execute("DELETE FROM symbols")
+        self.db.execute("DELETE FROM atoms")
+        self.symbol_count = 0
+
+    def add(self, model, symbols):
+        """
+        Stores the atoms of a model
+
+        Parameters
+        ----------
+        model : Model
+            The model
+        symbols : SymbolTable
+            The terms the model refers to
+        """
+
+        # only terms interned since the last model are new
+        self.db.executemany("INSERT INTO symbols VALUES (?, ?)", enumerate(symbols.names[self.symbol_count:], self.symbol_count))
+        self.symbol_count = len(symbols.names)
+
+        self.db.executemany("INSERT INTO atoms VALUES (?, ?, ?, ?)", (
+            (model.index, timestep, predicate, atom)
+            for i, timestep in enumerate(model.timesteps)
+            for predicate, atoms in enumerate([model.actions(i), model.fluents(i)])
+            for atom in atoms
+        ))
+
+    def close(self):
+        """
+        Commits and closes the database
+        """
+
+        # building the indexes once is faster than updating them for every model
+        self.db.commit()
+        self.db.executescript(self.indexes)
+        self.db.close()
+
+class TrajectoryExport:
+    """
+    Writes the atoms of all models into a compact binary file that can be
+    memory mapped (see TrajectoryFile). All numbers are little-endian, every
+    section starts at a multiple of 8 bytes:
+
+    - header: magic, version, number of models, entries and symbols and the
+      offsets of the sections (see header)
+    - entries: (model, timestep, predicate, symbol) as 4 x u32 per atom, ordered
+      by model, timestep and predicate (0 for occurs, 1 for holds)
+    - models: start of every model in the entries as u64 (one more than models,
+      the last is the number of entries), followed by the numbers of the models
+      as u32
+    - symbols: start of every term in the names as u64 (one more than symbols)
+    - names: the UTF-8 encoded terms
+
+    Attributes
+    ----------
+    file : IO
+        The binary file
+    entry_count : int
+        Number of entries written
+    model_start : array
+        Start of every model in the entries
+    model_numbers : array
+        Number of every model
+    symbols : SymbolTable
+        The terms the models refer to
+
+    Methods
+    -------
+    add(model, symbols)
+        Appends the atoms of a model
+    close()
+        Writes models, symbols and header and closes the file
+    """
+
+    magic = b"CLINGOTR"
+    version = 1
+    # magic, version, models, entries, symbols, reserved and the offsets of
+    # entries, models, symbols and names
+    header = Struct("<8sIIQIIQQQQ")
+
+    def __init__(self, file_path):
+        """
+        Parameters
+        ----------
+        file_path : str
+            Path to the binary file
+        """
+
+        self.file = open(file_path, "wb")
+        # the header is written once all sizes are known
+        self.file.write(bytes(self.header.size))
+        self.entry_count = 0
+        self.model_start = array("Q")
+        self.model_numbers = array("I")
+        self.symbols = SymbolTable()
+
+    def add(self, model, symbols):
+        """
+        Appends the atoms of a model
+
+        Parameters
+        ----------
+        model : Model
+            The model
+        symbols : SymbolTable
+            The terms the model refers to
+        """
+
+        entries = array("I")
+
+        for i, timestep in enumerate(model.timesteps):
+            for predicate, atoms in enumerate([model.actions(i), model.fluents(i)]):
+                for atom in atoms:
+                    entries.extend((model.index, timestep, predicate, atom))
+
+        if byteorder == "big":
+            entries.byteswap()
+
+        self.model_start.append(self.entry_count)
+        self.model_numbers.append(model.index)
+        self.entry_count += len(entries) // 4
+        self.file.write(entries.tobytes())
+        self.symbols = symbols
+
+    def write_section(self, values):
+        """
+        Writes a section starting at a multiple of 8 bytes
+
+        Parameters
+        ----------
+        values : array
+            The content of the section
+
+        Returns
+        -------
+        int
+            Offset of the section
+        """
+
+        self.file.write(bytes(-self.file.tell() % 8))
+        offset = self.file.tell()
+
+        if byteorder == "big":
+            values = array(values.typecode, values)
+            values.byteswap()
+
+        self.file.write(values.tobytes())
+
+        return offset
+
+    def close(self):
+        """
+        Writes models, symbols and header and closes the file
+        """
+
+        names = [name.encode() for name in self.symbols.names]
+        symbol_start = array("Q", [0])
+
+        for name in names:
+            symbol_start.append(symbol_start[-1] + len(name))
+
+        entries_offset = self.header.size
+        models_offset = self.write_section(self.model_start + array("Q", [self.entry_count]))
+        self.write_section(self.model_numbers)
+        symbols_offset = self.write_section(symbol_start)
+        names_offset = self.write_section(array("B", b"".join(names)))
+
+        self.file.seek(0)
+        self.file.write(self.header.pack(
+            self.magic, self.version, len(self.model_numbers), self.entry_count, len(names), 0,
+            entries_offset, models_offset, symbols_offset, names_offset
+        ))
+        self.file.close()
+
+class TrajectoryFile:
+    """
+    Memory maps a file written by TrajectoryExport. Entries and models are not
+    copied, only the terms are decoded
+
+    Attributes
+    ----------
+    entries : memoryview
+        (model, timestep, predicate, symbol) of all atoms as a flat u32 view
+    model_start : memoryview
+        Start of every model in the entries (u64), one more than models
+    model_numbers : memoryview
+        Number of every model (u32)
+    names : list
+        The terms
+
+    Methods
+    -------
+    model(i)
+        Returns the entries of the i-th model
+    close()
+        Releases the memory map
+    """
+
+    def __init__(self, file_path):
+        """
+        Parameters
+        ----------
+        file_path : str
+            Path to the binary file
+        """
+
+        with open(file_path, "rb") as file:
+            self.buffer = mmap(file.fileno(), 0, access=ACCESS_READ)
+
+        header = TrajectoryExport.header
+        magic, version, model_count, entry_count, symbol_count, reserved, entries_offset, models_offset, symbols_offset, names_offset = (
+            header.unpack_from(self.buffer)
+        )
+
+        if magic != TrajectoryExport.magic or version != TrajectoryExport.version:
+            self.buffer.close()
+            raise ValueError("%s is not a trajectory file of version %d" % (file_path, TrajectoryExport.version))
+
+        if byteorder == "big":
+            self.buffer.close()
+            raise ValueError("trajectory files can only be memory mapped on little-endian machines")
+
+        view = memoryview(self.buffer)
+        numbers_offset = models_offset + 8 * (model_count + 1)
+        self.entries = view[entries_offset:entries_offset + 16 * entry_count].cast("I")
+        self.model_start = view[models_offset:numbers_offset].cast("Q")
+        self.model_numbers = view[numbers_offset:numbers_offset + 4 * model_count].cast("I")
+
+        symbol_start = view[symbols_offset:symbols_offset + 8 * (symbol_count + 1)].cast("Q")
+        names = view[names_offset:]
+        self.names = [str(names[symbol_start[i]:symbol_start[i + 1]], "utf-8") for i in range(symbol_count)]
+        symbol_start.release()
+        names.release()
+        view.release()
+
+    def model(self, i):
+        """
+        Returns the entries of the i-th model
+
+        Parameters
+        ----------
+        i : int
+            Position of the model, starting at 0
+
+        Returns
+        -------
+        memoryview
+            (model, timestep, predicate, symbol) of the atoms as a flat u32 view
+        """
+
+        return self.entries[4 * self.model_start[i]:4 * self.model_start[i + 1]]
+
+    def close(self):
+        """
+        Releases the memory map, views returned by model must be released before
+        """
+
+        for view in [self.entries, self.model_start, self.model_numbers]:
+            view.release()
+
+        self.buffer.close()
 
 class PrettyPrintClingoOutput:
     """
     Class containing methods to pretty print clingo output. Requires clingo output in JSON format and predicates occurs/2 and holds/2. Usage: clingo my_program.lp --outf=2 | python3 pretty-print.py
+
+    Models are parsed and printed one at a time while clingo is still running.
+    Since clingo reports the number of models and the time after the models, the
+    summary is printed after the last model
     
     Attributes
     ----------
-    clingo_output : str
-        A raw JSON string from the command line
-    num_results : str
+    clingo_output : ClingoOutputStream
+        The clingo output from the command line
+    num_results : int
         The number of models found by clingo
-    time : str
+    time : dict
         The time needed by clingo to solve
-    actions : list
-        All occuring actions per model
-    fluents : list
-        All fluents per model that hold
+    clingo_input : list
+        The input files of clingo
+    symbols : SymbolTable
+        The terms of all models
+    kept_models : list
+        The parsed models if they are kept, None otherwise
+    pool : Pool
+        The process pool or None
+    model_range : tuple
+        First and last selected model or None
+    time_range : tuple
+        First and last selected timestep or None
+    atom_filter : str
+        Regular expression selected atoms contain or None
+    index : ModelIndex
+        Index of the printed atoms or None
+    dedup : bool
+        Print models with the same printed atoms only once
+    fingerprints : dict
+        Numbers of the models with the same printed atoms per fingerprint
+    stopped : bool
+        Printing has stopped, the remaining witnesses are only skipped
+    export : TrajectoryExport
+        Binary file of the printed atoms or None
+    batch_size : int
+        Number of witnesses rendered at once in the process pool
+    pending_batches : int
+        Maximum number of batches in the process pool
     output_file : str
         Destination of pretty printed output
+    verbose : bool
+        Print why there is nothing to print
     template : dict
         Format strings for output
+    column_width : dict
+        Minimum width of the occurs and holds columns
 
     Methods
     -------
-    print_to_file(timestamp=False, only_time=False)
+    tokenize_atom(atom)
+        Splits an atom into predicate, term and timestep
+    is_selected(index)
+        Checks if a model is selected
+    models()
+        Yields one model at a time
+    finish(witnesses, complete)
+        Reads the summary after the last witness
+    fingerprint(model, text=False)
+        Hashes the atoms of a model
+    delta_fluents(model)
+        Returns the changes of the fluents per timestep
+    render_model(model, delta=False)
+        Renders the table of one model as a list of lines
+    render_parallel(delta=False)
+        Yields the models rendered in the process pool in order
+    render(only_time=False, delta=False)
+        Yields the output in chunks of one model each
+    print_to_file(timestamp=False, only_time=False, delta=False)
         Prints clingo output to designated file
-    print(only_time=False)
+    write_to_file(filename, chunks)
+        Writes rendered output into a file
+    print_to_shell(only_time=False, delta=False)
         Prints clingo output to command line
     
     """
 
-    clingo_output = ""
-    num_results = ""
-    time = ""
-    clingo_input = ""
-    actions = []
-    fluents = []
     output_file = "./results.txt"
+    verbose = True
+    batch_size = 16
+    pending_batches = 16
+    # the timestep is the last argument, so the greedy term stops at the last
+    # comma and nested terms like move(r1,10) are kept intact
+    atom_pattern = compile(r"(occurs|holds)\((.+),([0-9]+)\)$")
     template = {
-        "divider": "+------+------------------------------+----------------------------+",
         "title": "RESULTS FOR ",
         "models": "Models: {}\n\n",
         "time total": "Time (Total):    {:10.3f}s\n",
         "time solving": "Time (Solving):  {:10.3f}s ({:.2f}% of total time)\n",
         "time grounding": "Time (Grounding):{:10.3f}s ({:.2f}% of total time)\n\n",
-        "header model": "|{:^66}|\n",
-        "header time": "| TIME |",
-        "header occurs": " OCCURS                       |",
-        "header holds": " HOLDS                      |\n",
-        "empty action time": "                              |",
-        "empty action notime": "|      |                              |",
-        "cell action notime": "|      | {:<29}|",
-        "cell action": " {:<29}|",
-        "cell fluent": " {:<27}|\n"
+        "header model": "|{:^{}}|\n",
+        "header": "| TIME | {:<{}}| {:<{}}|\n",
+        "row": "|{:>5} | {:<{}}| {:<{}}|\n",
+        "distinct": "Distinct models: {} of {}\n",
+        "duplicate": "MODEL: {} found {} times: {}\n"
+    }
+    column_width = {
+        "action": 29,
+        "fluent": 27
     }
 
-    def __init__(self, output):
+    def __init__(self, output, keep_models=False, pool=None, model_range=None, time_range=None, atom_filter=None, index=None,
+            dedup=False, export=None):
+        """
+        Parameters
+        ----------
+        output : IO
+         Clingo JSON output from command line, e.g. stdin
+        keep_models : bool, optional
+         Keep the parsed models to render them again (default is False)
+        pool : Pool, optional
+         Process pool to render the models in, ignored if the models are kept
+         (default is None)
+        model_range : tuple, optional
+         First and last model to print, starting at 1, the last may be None
+         (default is None, i.e. all)
+        time_range : tuple, optional
+         First and last timestep to print, the last may be None (default is None,
+         i.e. all)
+        atom_filter : str, optional
+         Regular expression an atom must contain to be printed, e.g. "^occurs"
+         (default is None, i.e. all)
+        index : ModelIndex, optional
+         Index the printed atoms are stored in, the models are then parsed in
+         this process (default is None)
+        dedup : bool, optional
+         Print models with the same printed atoms only once (default is False)
+        export : TrajectoryExport, optional
+         Binary file the printed atoms are written to, the models are then parsed
+         in this process (default is None)
+        """
+
+        self.pool = pool
+        self.index = index
+        self.dedup = dedup
+        self.export = export
+        self.fingerprints = {}
+        self.stopped = False
+        self.model_range = model_range
+        self.time_range = time_range
+        self.atom_filter = atom_filter
+
+        self.clingo_output = ClingoOutputStream(output)
+        self.symbols = SymbolTable()
+        self.kept_models = [] if keep_models else None
+        self.clingo_input = []
+        self.num_results = 0
+        self.time = {}
+
+    def tokenize_atom(self, atom):
+        """
+        Splits an atom into predicate, term and timestep
+
+        Parameters
+        ----------
+        atom : str
+            An atom of a witness, e.g. occurs(move(r1,10),10)
+
+        Returns
+        -------
+        str, str, int
+            Predicate, term and timestep, e.g. ("occurs", "move(r1,10)", 10), or
+            None if the atom is neither occurs/2 nor holds/2
+        """
+
+        token = self.atom_pattern.match(atom)
+
+        if token is None:
+            return None
+
+        return token.group(1), token.group(2), int(token.group(3))
+
+    def is_selected(self, index):
+        """
+        Checks if a model is selected, the witnesses of other models are skipped
+        without being decoded
+
+        Parameters
+        ----------
+        index : int
+            Number of the model, starting at 1
+
+        Returns
+        -------
+        bool
+            True if the model is to be printed
+        """
+
+        if self.stopped:
+            return False
+
+        first, last = self.model_range if self.model_range is not None else (1, None)
+
+        return first <= index and (last is None or index <= last)
+
+    def parse_witness(self, index, result):
+        """
+        Sorts the atoms of a witness by timestep, the terms are interned in the
+        symbol table
+
+        Parameters
+        ----------
+        index : int
+            Number of the model, starting at 1
+        result : dict
+            A witness of the clingo output
+
+        Returns
+        -------
+        Model
+            The model or None if the witness contains no fluents
+        """
+
+        a = {}
+        f = {}
+        tokenize = self.tokenize_atom
+        intern = self.symbols.intern
+        atom_filter = compile(self.atom_filter).search if self.atom_filter is not None else None
+
+        if self.time_range is not None:
+            first, last = self.time_range
+            last = last if last is not None else float("inf")
+
+        for atom in result["Value"]:
+            if self.time_range is not None:
+                # the timestep is the last argument, check it before tokenizing
+                timestep = atom[atom.rfind(",") + 1:-1]
+
+                if not timestep.isdigit() or not first <= int(timestep) <= last:
+                    continue
+
+            if atom_filter is not None and atom_filter(atom) is None:
+                continue
+
+            token = tokenize(atom)
+
+            if token is None:
+                continue
+
+            predicate, atom, timestep = token
+            atoms = a if predicate == "occurs" else f
+
+            if timestep in atoms:
+                atoms[timestep].append(intern(atom))
+            else:
+                atoms[timestep] = [intern(atom)]
+
+        # a selection may leave no fluents
+        if len(f) == 0 and self.time_range is None and atom_filter is None:
+            return None
+
+        return Model(index, a, f)
+
+    def models(self):
+        """
+        Yields one model at a time as soon as clingo has written it. Input, number
+        of models and time are set once the first model respectively the last
+        model has been read. If the models are kept, later calls yield the kept
+        models without reading the output again
+
+        Yields
+        ------
+        Model
+            The next model
+        """
+
+        if self.kept_models is not None and self.clingo_output.buffer is None:
+            yield from self.kept_models
+            return
+
+        # only the witnesses of selected models are decoded
+        witnesses = self.clingo_output.witnesses(selected=self.is_selected)
+        complete = True
+
+        for index, result in witnesses:
+            self.clingo_input = self.clingo_output.clingo_input
+            model = self.parse_witness(index, result)
+
+            if model is None:
+                complete = False
+                break
+
+            if self.kept_models is not None:
+                self.kept_models.append(model)
+
+            if self.index is not None:
+                self.index.add(model, self.symbols)
+
+            if self.export is not None:
+                self.export.add(model, self.symbols)
+
+            yield model
+
+        self.finish(witnesses, complete)
+
+    def finish(self, witnesses, complete):
+        """
+        Reads the summary after the last witness
+
+        Parameters
+        ----------
+        witnesses : generator
+            The witnesses of the clingo output, possibly not read completely
+        complete : bool
+            False if a witness without fluents stopped printing
+
+        Raises
+        ------
+        ValueError
+            If the output has no result or time, i.e. it is not a clingo output
+        """
+
+        if not complete:
+            if self.verbose:
+                print("Not enough data provided!")
+
+        # skip the rest of the output to get the summary
+        self.stopped = True
+
+        for result in witnesses:
+            pass
+
+        self.clingo_input = self.clingo_output.clingo_input
+        self.num_results = self.clingo_output.num_results
+        self.time = self.clingo_output.time
+
+        # e.g. broken JSON or JSON that is not written by clingo --outf=2
+        if self.clingo_output.result == "" or "Total" not in self.time or "Solve" not in self.time:
+            raise ValueError("No result and time found, not a clingo output in JSON format")
+
+        if self.clingo_output.result == "UNSATISFIABLE" and self.verbose:
+            print("Nothing to print! Reason: %s" % self.clingo_output.result)
+
+    def fingerprint(self, model, text=False):
         """
+        Hashes the atoms of a model. Since the ids of every timestep are sorted,
+        models with the same atoms have the same fingerprint
+
         Parameters
         ----------
-        output : str
-         Raw clingo JSON output from command line
+        model : Model
+            The model
+        text : bool, optional
+            Hash the terms instead of their ids, needed to compare models parsed
+            with different symbol tables, e.g. in different processes (default is
+            False)
+
+        Returns
+        -------
+        bytes
+            The fingerprint
         """
 
-        self.clingo_output = (loads(output))
-        self.clingo_input = self.clingo_output["Input"]
-        
-        if self.clingo_output["Result"] == "UNSATISFIABLE":
-            print("Nothing to print! Reason: %s" % self.clingo_output["Result"])
+        if text:
+            names = self.symbols.names
+            fields = []
+
+            for i, timestep in enumerate(model.timesteps):
+                actions = sorted(names[atom] for atom in model.actions(i))
+                fluents = sorted(names[atom] for atom in model.fluents(i))
+                fields.extend([str(timestep), str(len(actions))] + actions + [str(len(fluents))] + fluents)
+
+            fields = [field.encode() for field in fields]
         else:
-            self.num_results = self.clingo_output["Models"]["Number"]
-            self.time = self.clingo_output["Time"]
-            self.time["Grounding"] = self.time["Total"] - self.time["Solve"]
-            self.clingo_output = self.clingo_output["Call"][0]["Witnesses"]
-
-            for result in self.clingo_output:
-                a = {}
-                f = {}
-
-                for atom in result["Value"]:
-                    # remove trailing "."
-                    atom = atom[:-1]
-                    is_action = False
-
-                    if atom.startswith("occurs"):
-                        is_action = True
-                        # remove "occurs("
-                        atom = atom[7:]
-                    elif atom.startswith("holds("):
-                        # remove "holds("
-                        atom = atom[6:]
-                    else:
-                        continue
-
-                    # find and remove trailing time step, e.g. move(1,10)
-                    timestep = int(findall("[0-9]{1,}$", atom)[0])
-                    atom = atom.rstrip(str(timestep))[:-1]
-
-                    if is_action:
-                        if a.get(timestep) != None:
-                            a[timestep].append(atom)
-                        else:
-                            a[timestep] = [atom]
-                    else:
-                        if f.get(timestep) != None:
-                            f[timestep].append(atom)
-                        else:
-                            f[timestep] = [atom]
-
-                if len(f) == 0:
-                    print("Not enough data provided!")
-                    return
-
-                # fluents are one timestep ahead
-                max_time = list(sorted(f.keys()))[-1]
-
-                if max_time == 0 and len(a) == 0:
-                    a[0] = []
-                else:
-                    # add another element to actions to have as much as fluents
-                    for i in range((list(sorted(a.keys()))[-1])+1, max_time+1):
-                        a[i] = []
-                    
-                    for timestep in f:
-                        f[timestep] = sorted(f[timestep])
-                        a[timestep] = sorted(a[timestep])
+            fields = [values.tobytes() for values in [
+                model.timesteps, model.action_start, model.action_atoms, model.fluent_start, model.fluent_atoms
+            ]]
+
+        digest = blake2b(digest_size=16)
+
+        # every field is prefixed by its length, a separator could occur inside a field
+        for field in fields:
+            digest.update(len(field).to_bytes(8, "little"))
+            digest.update(field)
+
+        return digest.digest()
+
+    def is_duplicate(self, index, fingerprint):
+        """
+        Records the fingerprint of a model
+
+        Parameters
+        ----------
+        index : int
+            Number of the model
+        fingerprint : bytes
+            The fingerprint of the model
+
+        Returns
+        -------
+        bool
+            True if a model with the same fingerprint has been recorded before
+        """
+
+        if fingerprint in self.fingerprints:
+            self.fingerprints[fingerprint].append(index)
+            return True
+
+        self.fingerprints[fingerprint] = [index]
+
+        return False
+
+    def delta_fluents(self, model):
+        """
+        Returns the fluents of the first timestep and the changes of the fluents at
+        every later timestep, i.e. added fluents prefixed with + and removed
+        fluents prefixed with -
+
+        Parameters
+        ----------
+        model : Model
+            The model
+
+        Returns
+        -------
+        list
+            Sorted fluents respectively changes per timestep
+        """
+
+        names = self.symbols.names
+
+        if len(model.timesteps) == 0:
+            return []
+
+        previous = set(model.fluents(0))
+        fluents = [sorted(names[atom] for atom in previous)]
+
+        for i in range(1, len(model.timesteps)):
+            current = set(model.fluents(i))
+            fluents.append(
+                sorted("+" + names[atom] for atom in current - previous) +
+                sorted("-" + names[atom] for atom in previous - current)
+            )
+            previous = current
+
+        return fluents
+
+    def render_model(self, model, delta=False):
+        """
+        Renders the table of one model. The columns are as wide as the longest
+        atom (but at least as wide as given in column_width). A model without
+        selected atoms (see --time and --atoms) is not rendered
+
+        Parameters
+        ----------
+        model : Model
+            The model
+        delta : bool, optional
+            Show only the changes of the fluents after the first timestep (default
+            is False)
+
+        Returns
+        -------
+        list
+            The lines of the table, including line breaks
+        """
+
+        if len(model.timesteps) == 0:
+            return []
+
+        names = self.symbols.names
+        actions = [sorted(names[atom] for atom in model.actions(i)) for i in range(len(model.timesteps))]
+
+        if delta:
+            fluents = self.delta_fluents(model)
+        else:
+            fluents = [sorted(names[atom] for atom in model.fluents(i)) for i in range(len(model.timesteps))]
+
+        action_width = max([self.column_width["action"]] + [len(atom) + 1 for atoms in actions for atom in atoms])
+        fluent_width = max([self.column_width["fluent"]] + [len(atom) + 1 for atoms in fluents for atom in atoms])
+        divider = "+------+" + "-" * (action_width + 1) + "+" + "-" * (fluent_width + 1) + "+\n"
+        row = self.template["row"]
+
+        lines = [
+            "+" + "=" * (len(divider) - 3) + "+\n",
+            self.template["header model"].format(" MODEL: " + str(model.index) + " ", len(divider) - 3),
+            divider,
+            self.template["header"].format("OCCURS", action_width, "HOLDS (+/-)" if delta else "HOLDS", fluent_width)
+        ]
 
-                self.fluents.append(f)
-                self.actions.append(a)
+        for timestep, a, f in zip(model.timesteps, actions, fluents):
+            lines.append(divider)
 
-    def print_to_file(self, timestamp=False, only_time=False):
+            # pad the shorter of both columns with empty cells, every timestep gets a row
+            for j in range(max(1, len(a), len(f))):
+                lines.append(row.format(
+                    timestep if j == 0 else "",
+                    a[j] if j < len(a) else "", action_width,
+                    f[j] if j < len(f) else "", fluent_width
+                ))
+
+        lines.append(divider.replace("-", "=") + "\n")
+
+        return lines
+
+    def render_duplicates(self):
+        """
+        Renders the number of distinct models and the models found more than once
+
+        Returns
+        -------
+        list
+            The lines, including line breaks
+        """
+
+        lines = [self.template["distinct"].format(
+            len(self.fingerprints), sum(len(indexes) for indexes in self.fingerprints.values())
+        )]
+
+        for indexes in self.fingerprints.values():
+            if len(indexes) > 1:
+                lines.append(self.template["duplicate"].format(indexes[0], len(indexes), ", ".join(str(i) for i in indexes)))
+
+        return lines + ["\n"]
+
+    def render_summary(self):
+        """
+        Renders number of models and time needed by clingo
+
+        Returns
+        -------
+        list
+            The lines of the summary, including line breaks
+        """
+
+        return [
+            self.template["models"].format(self.num_results),
+            self.template["time total"].format(self.time["Total"]),
+            self.template["time solving"].format(self.time["Solve"], (self.time["Solve"]*100/self.time["Total"])),
+            self.template["time grounding"].format(self.time["Grounding"], (self.time["Grounding"]*100/self.time["Total"]))
+        ]
+
+    def render_parallel(self, delta=False):
+        """
+        Decodes, parses and renders batches of witnesses in the process pool and
+        yields the rendered models in the order of the clingo output. Only a
+        limited number of batches is pending at once, so memory stays bounded
+
+        Parameters
+        ----------
+        delta : bool, optional
+            Show only the changes of the fluents after the first timestep (default
+            is False)
+
+        Yields
+        ------
+        str
+            The table of one model
+        """
+
+        # the workers decode the witnesses
+        witnesses = self.clingo_output.witnesses(raw=True, selected=self.is_selected)
+        pending = deque()
+        complete = True
+
+        while complete:
+            batch = list(islice(witnesses, self.batch_size))
+
+            if len(batch) != 0:
+                pending.append(self.pool.apply_async(render_batch, ((batch, delta, self.time_range, self.atom_filter, self.dedup),)))
+
+            # wait for the oldest batch if enough batches are pending or all are submitted
+            while len(pending) != 0 and (len(pending) >= self.pending_batches or len(batch) == 0):
+                chunks, complete = pending.popleft().get()
+                self.clingo_input = self.clingo_output.clingo_input
+
+                for index, fingerprint, chunk in chunks:
+                    if fingerprint is None or not self.is_duplicate(index, fingerprint):
+                        yield chunk
+
+                if not complete:
+                    break
+
+            if len(batch) == 0:
+                break
+
+        self.finish(witnesses, complete)
+
+    def render(self, only_time=False, delta=False):
+        """
+        Yields the output in chunks of one model each, starting with the title and
+        ending with the summary. Nothing is yielded if there is no model
+
+        Parameters
+        ----------
+        only_time : bool, optional
+            Render only time needed by clingo to solve (default is False)
+        delta : bool, optional
+            Show only the changes of the fluents after the first timestep (default
+            is False)
+
+        Yields
+        ------
+        str
+            A chunk of the output
+        """
+
+        rendered = False
+        # kept models may be rendered again, every rendering finds the duplicates anew
+        self.fingerprints = {}
+
+        if only_time:
+            chunks = ("" for model in self.models())
+        elif self.pool is not None and self.kept_models is None and self.index is None and self.export is None:
+            chunks = self.render_parallel(delta)
+        else:
+            # models without selected atoms are not counted as duplicates
+            chunks = (
+                "".join(self.render_model(model, delta)) for model in self.models()
+                if not self.dedup or len(model.timesteps) == 0
+                or not self.is_duplicate(model.index, self.fingerprint(model))
+            )
+
+        for chunk in chunks:
+            if not rendered:
+                yield self.template["title"] + " ".join(self.clingo_input) + "\n"
+                rendered = True
+
+            if chunk != "":
+                yield chunk
+
+        if rendered:
+            if self.dedup and not only_time:
+                yield "".join(self.render_duplicates())
+
+            yield "".join(self.render_summary())
+
+    def print_to_file(self, timestamp=False, only_time=False, delta=False):
         """
         Create output file and write output into it
 
@@ -144,9 +1395,15 @@ class PrettyPrintClingoOutput:
             Add timestamp to name of output file (default is False)
         only_time : bool, optional
             Print only time needed by clingo to solve (default is False)
+        delta : bool, optional
+            Show only the changes of the fluents after the first timestep (default
+            is False)
         """
 
-        if len(self.fluents) == 0 or len(self.actions) == 0:
+        chunks = self.render(only_time, delta)
+        first = next(chunks, None)
+
+        if first is None:
             return
 
         print("Writing results to file ...")
@@ -156,123 +1413,294 @@ class PrettyPrintClingoOutput:
         else:
             filename = self.output_file
 
-        file = open(filename, "w+")
-
-        file.write(self.template["title"] + " ".join(self.clingo_input) + "\n")
-        file.write(self.template["models"].format(self.num_results))
-        file.write(self.template["time total"].format(self.time["Total"]))
-        file.write(self.template["time solving"].format(self.time["Solve"], (self.time["Solve"]*100/self.time["Total"])))
-        file.write(self.template["time grounding"].format(self.time["Grounding"], (self.time["Grounding"]*100/self.time["Total"])))
-
-        if not only_time:
-            for i in range(0,len(self.fluents)):
-                f = self.fluents[i]
-                a = self.actions[i]
-
-                file.write("+" + self.template["divider"].replace("-", "=").replace("+", "=")[1:-1] + "+\n")
-                file.write(self.template["header model"].format((" MODEL: " + str(i+1) + " ")))
-                file.write(self.template["divider"] + "\n")
-                file.write(self.template["header time"])
-                file.write(self.template["header occurs"])
-                file.write(self.template["header holds"])
-
-                for timestep in sorted(f.keys()):
-                    file.write(self.template["divider"])
-                    
-                    # compensate length of actions and fluents if there are 
-                    # less actions than fluents per timestep (and vice versa)
-                    while len(a[timestep]) < len(f[timestep]):
-                        a[timestep].append("")
-
-                    while len(f[timestep]) < len(a[timestep]):
-                        f[timestep].append("")
-
-                    file.write("\n|")
-                    file.write((str(timestep).rjust(5) + " |"))
-
-                    for i in range(0,len(f[timestep])):
-                        if a[timestep][i] == "":
-                            if i == 0:
-                                file.write(self.template["empty action time"])
-                            else:
-                                file.write(self.template["empty action notime"])
-                        else:
-                            if i == 0:
-                                file.write(self.template["cell action"].format(a[timestep][i]))
-                            else:
-                                file.write(self.template["cell action notime"].format(a[timestep][i]))
-                        
-                        file.write(self.template["cell fluent"].format(f[timestep][i]))
-                
-                file.write(self.template["divider"].replace("-", "=") + "\n\n")
+        self.write_to_file(filename, chain((first,), chunks))
+        print("... Done.")
+
+    def write_to_file(self, filename, chunks):
+        """
+        Writes rendered output into a file, the file is only created if there is
+        any output
+
+        Parameters
+        ----------
+        filename : str
+            Destination of the output
+        chunks : iterable
+            The output as yielded by render
+
+        Returns
+        -------
+        bool
+            True if the file has been written
+        """
+
+        file = None
+
+        for chunk in chunks:
+            if file is None:
+                file = open(filename, "w+")
+
+            file.write(chunk)
+
+        if file is None:
+            return False
 
         file.close()
-        print("... Done.")
 
-    def print_to_shell(self, only_time=False):
+        return True
+
+    def print_to_shell(self, only_time=False, delta=False):
         """
-        Write output to command line
+        Write output to command line while clingo is still running
 
         Parameters
         ----------
         only_time : bool, optional
             Print only time needed by clingo to solve (default is False)
+        delta : bool, optional
+            Show only the changes of the fluents after the first timestep (default
+            is False)
         """
 
-        if len(self.fluents) == 0 or len(self.actions) == 0:
-            return
+        for chunk in self.render(only_time, delta):
+            stdout.write(chunk)
+            # show the model while clingo searches for the next one
+            stdout.flush()
+
+def parse_range(text):
+    """
+    Parses a range of the command line
 
-        print(self.template["title"] + " ".join(self.clingo_input))
-        print(self.template["models"].format(self.num_results), end="")
-        print(self.template["time total"].format(self.time["Total"]), end="")
-        print(self.template["time solving"].format(self.time["Solve"], (self.time["Solve"]*100/self.time["Total"])), end="")
-        print(self.template["time grounding"].format(self.time["Grounding"], (self.time["Grounding"]*100/self.time["Total"])), end="")
-
-        if not only_time:
-            for i in range(0,len(self.fluents)):
-                f = self.fluents[i]
-                a = self.actions[i]
-
-                print("+" + self.template["divider"].replace("-", "=").replace("+", "=")[1:-1] + "+")
-                print(self.template["header model"].format((" MODEL: " + str(i+1) + " ")), end="")
-                print(self.template["divider"])
-                print(self.template["header time"], end="")
-                print(self.template["header occurs"], end="")
-                print(self.template["header holds"], end="")
-
-                for timestep in sorted(f.keys()):
-                    print(self.template["divider"], end="")
-                    
-                    # compensate length of actions and fluents if there are 
-                    # less actions than fluents per timestep (and vice versa)
-                    while len(a[timestep]) < len(f[timestep]):
-                        a[timestep].append("")
-
-                    while len(f[timestep]) < len(a[timestep]):
-                        f[timestep].append("")
-
-                    print("\n|", end="")
-                    print(str(timestep).rjust(5), end=" |")
-
-                    for i in range(0,len(f[timestep])):
-                        if a[timestep][i] == "":
-                            if i == 0:
-                                print(self.template["empty action time"], end="")
-                            else:
-                                print(self.template["empty action notime"], end="")
-                        else:
-                            if i == 0:
-                                print(self.template["cell action"].format(a[timestep][i]), end="")
-                            else:
-                                print(self.template["cell action notime"].format(a[timestep][i]), end="")
-                        
-                        print(self.template["cell fluent"].format(f[timestep][i]), end="")
-                
-                print(self.template["divider"].replace("-", "="), end="\n\n")
+    Parameters
+    ----------
+    text : str
+        A range like 100-120, a single number like 5 or an open range like 40-
+
+    Returns
+    -------
+    tuple
+        First and last number, the last is None for open ranges
+    """
+
+    match = compile(r"^([0-9]+)(?:(-)([0-9]*))?$").match(text)
+
+    if match is None:
+        raise ArgumentTypeError("invalid range '%s', expected e.g. 100-120, 5 or 40-" % text)
+
+    first = int(match.group(1))
+    last = int(match.group(3)) if match.group(3) else (None if match.group(2) else first)
+
+    return first, last
+
+def render_batch(task):
+    """
+    Decodes, parses and renders a batch of witnesses, e.g. in a worker process
+
+    Parameters
+    ----------
+    task : tuple
+        Numbers and JSON text of the witnesses, whether only the changes of the
+        fluents are shown, the selected timesteps, the atom filter and whether
+        fingerprints are needed
+
+    Returns
+    -------
+    list, bool
+        Number, fingerprint (None without dedup or selected atoms) and table
+        of every model and False if a witness without fluents stopped rendering
+    """
+
+    witnesses, delta, time_range, atom_filter, dedup = task
+    printer = PrettyPrintClingoOutput(None, time_range=time_range, atom_filter=atom_filter)
+    chunks = []
+
+    for index, result in witnesses:
+        model = printer.parse_witness(index, loads(result))
+
+        if model is None:
+            return chunks, False
+
+        # the symbol tables of the processes differ, so the terms are hashed
+        fingerprint = printer.fingerprint(model, text=True) if dedup and len(model.timesteps) != 0 else None
+        chunks.append((index, fingerprint, "".join(printer.render_model(model, delta))))
+
+    return chunks, True
+
+def batch_inputs(path):
+    """
+    Returns the clingo outputs of a batch
+
+    Parameters
+    ----------
+    path : str
+        A directory (all .json files in it) or a glob pattern, e.g. "results/*/*.json"
+
+    Returns
+    -------
+    list
+        Paths of the clingo outputs in alphabetical order
+    """
+
+    if isdir(path):
+        path = join(path, "*.json")
+
+    return sorted(glob(path))
+
+def print_batch_file(task):
+    """
+    Pretty prints one clingo output of a batch, e.g. in a worker process
+
+    Parameters
+    ----------
+    task : tuple
+        Path of the clingo output, path of the report and the options of the
+        printer (delta, model_range, time_range, atom_filter and dedup)
+
+    Returns
+    -------
+    list
+        Line of the summary index: clingo output, report (empty if there is
+        nothing to print), result, number of models and times
+    """
+
+    input_path, report_path, delta, model_range, time_range, atom_filter, dedup = task
+
+    try:
+        with open(input_path) as clingo_output:
+            printer = PrettyPrintClingoOutput(clingo_output, model_range=model_range, time_range=time_range, atom_filter=atom_filter,
+                dedup=dedup)
+            printer.verbose = False
+
+            if not printer.write_to_file(report_path, printer.render(delta=delta)):
+                report_path = ""
+    except (OSError, ValueError) as e:
+        print("Skipping %s: %s" % (input_path, e))
+
+        # the models may have been written before the error was found
+        if isfile(report_path):
+            remove(report_path)
+
+        return [input_path, "", "ERROR", "", "", "", ""]
+
+    return [input_path, report_path, printer.clingo_output.result, printer.num_results] + [
+        printer.time.get(key, "") for key in ["Total", "Solve", "Grounding"]
+    ]
+
+def print_batch(pool, inputs, output_path, delta=False, model_range=None, time_range=None, atom_filter=None, dedup=False):
+    """
+    Pretty prints many clingo outputs into one report each and writes a summary
+    index (index.csv) of all outputs
+
+    Parameters
+    ----------
+    pool : Pool
+        The process pool or None
+    inputs : list
+        Paths of the clingo outputs
+    output_path : str
+        Directory of the reports and the index, the reports keep the paths of
+        the clingo outputs relative to their common directory
+    delta : bool, optional
+        Show only the changes of the fluents after the first timestep (default
+        is False)
+    model_range : tuple, optional
+        First and last model to print (default is None, i.e. all)
+    time_range : tuple, optional
+        First and last timestep to print (default is None, i.e. all)
+    atom_filter : str, optional
+        Regular expression an atom must contain to be printed (default is None)
+    dedup : bool, optional
+        Print models with the same printed atoms only once (default is False)
+
+    Returns
+    -------
+    list
+        The lines of the index
+    """
+
+    # reports mirror the directories below the batch root, outputs with the same name in different directories get different reports
+    root = commonpath([dirname(input_path) or "." for input_path in inputs]) if inputs else ""
+    report_paths = [join(output_path, splitext(relpath(input_path, root))[0] + ".txt") for input_path in inputs]
+
+    # create all directories before the workers start writing
+    makedirs(output_path, exist_ok=True)
+    for report_path in report_paths:
+        makedirs(dirname(report_path), exist_ok=True)
+
+    tasks = [
+        (input_path, report_path, delta, model_range, time_range, atom_filter, dedup)
+        for input_path, report_path in zip(inputs, report_paths)
+    ]
+
+    if pool is not None:
+        rows = list(pool.imap(print_batch_file, tasks))
+    else:
+        rows = [print_batch_file(task) for task in tasks]
+
+    with open(join(output_path, "index.csv"), "w+") as index_file:
+        index_file.write(",".join(["File", "Report", "Result", "Models", "Time (Total)", "Time (Solving)", "Time (Grounding)"]) + "\n")
+        index_file.write("".join(",".join(str(value) for value in row) + "\n" for row in rows))
+
+    return rows
 
 def main():
-    pretty_printer = PrettyPrintClingoOutput(stdin.read())
-    pretty_printer.print_to_file(timestamp=False, only_time=False)
+    parser = ArgumentParser(description="Pretty prints clingo output in JSON format read from stdin (or many outputs with --batch)")
+    parser.add_argument("--delta", action="store_true",
+        help="show only the fluents added (+) and removed (-) at every timestep after the first one")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+        help="number of processes parsing and rendering the models (default is 1)")
+    parser.add_argument("--models", type=parse_range, metavar="RANGE",
+        help="print only these models, e.g. 100-120 (starting at 1), 5 or 40-")
+    parser.add_argument("--time", type=parse_range, metavar="RANGE", help="print only these timesteps, e.g. 40-60")
+    parser.add_argument("--atoms", metavar="REGEX", help="print only atoms containing REGEX, e.g. \"^occurs\" or \"robot\\(1\\)\"")
+    parser.add_argument("--dedup", action="store_true",
+        help="print models with the same printed atoms only once and list how often they were found")
+    parser.add_argument("--index", metavar="FILE",
+        help="store the printed atoms in an SQLite index to query them with query-index.py")
+    parser.add_argument("--export", metavar="FILE",
+        help="write the printed atoms into a binary file that can be memory mapped (see TrajectoryFile)")
+    parser.add_argument("--batch", metavar="PATH",
+        help="print all clingo outputs of a directory (*.json) or glob pattern instead of stdin, one report per output")
+    parser.add_argument("--output", metavar="DIR", default=".",
+        help="directory of the reports and the summary index.csv of --batch (default is the current directory)")
+    args = parser.parse_args()
+
+    if args.atoms is not None:
+        try:
+            compile(args.atoms)
+        except error as e:
+            parser.error("invalid --atoms: %s" % e)
+
+    if args.batch is not None and (args.index is not None or args.export is not None):
+        parser.error("--index and --export cannot be used with --batch")
+
+    # Ctrl+C is only handled by the main process
+    pool = Pool(args.jobs, initializer=signal, initargs=(SIGINT, SIG_IGN)) if args.jobs > 1 else None
+    index = ModelIndex(args.index) if args.index is not None else None
+    export = TrajectoryExport(args.export) if args.export is not None else None
+
+    try:
+        if args.batch is not None:
+            inputs = batch_inputs(args.batch)
+            print("Writing reports of %d clingo outputs to %s ..." % (len(inputs), args.output))
+            print_batch(pool, inputs, args.output, args.delta, args.models, args.time, args.atoms, args.dedup)
+            print("... Done.")
+            return
+
+        pretty_printer = PrettyPrintClingoOutput(stdin, pool=pool, model_range=args.models, time_range=args.time, atom_filter=args.atoms,
+            index=index, dedup=args.dedup, export=export)
+        pretty_printer.print_to_file(timestamp=False, only_time=False, delta=args.delta)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+        if index is not None:
+            index.close()
+
+        if export is not None:
+            export.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
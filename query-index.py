@@ -0,0 +1,180 @@
+#!/usr/local/bin/python3
+
+from argparse import ArgumentParser, ArgumentTypeError
+from itertools import groupby
+from os.path import isfile
+from re import compile
+from sqlite3 import connect
+
+# Usage:
+# python3 query-index.py [INDEX] --atom PATTERN [--predicate occurs|holds] [--time RANGE]
+# python3 query-index.py [INDEX] --diff MODEL MODEL [--predicate occurs|holds] [--time RANGE]
+#
+# The index is written by pretty-print.py --index [INDEX]
+
+predicates = ["occurs", "holds"]
+
+def parse_range(text):
+    """
+    Parses a range of the command line
+
+    Parameters
+    ----------
+    text : str
+        A range like 40-60, a single number like 5 or an open range like 40-
+
+    Returns
+    -------
+    tuple
+        First and last number, the last is None for open ranges
+    """
+
+    match = compile(r"^([0-9]+)(?:(-)([0-9]*))?$").match(text)
+
+    if match is None:
+        raise ArgumentTypeError("invalid range '%s', expected e.g. 40-60, 5 or 40-" % text)
+
+    first = int(match.group(1))
+    last = int(match.group(3)) if match.group(3) else (None if match.group(2) else first)
+
+    return first, last
+
+def conditions(predicate, time_range):
+    """
+    Creates the SQL conditions of the common options
+
+    Parameters
+    ----------
+    predicate : str
+        occurs, holds or None for both
+    time_range : tuple
+        First and last timestep or None for all
+
+    Returns
+    -------
+    str, list
+        The conditions (starting with AND) and their parameters
+    """
+
+    sql = ""
+    parameters = []
+
+    if predicate is not None:
+        sql += " AND atoms.predicate = ?"
+        parameters.append(predicates.index(predicate))
+
+    if time_range is not None:
+        sql += " AND atoms.timestep >= ?"
+        parameters.append(time_range[0])
+
+        if time_range[1] is not None:
+            sql += " AND atoms.timestep <= ?"
+            parameters.append(time_range[1])
+
+    return sql, parameters
+
+def find_atom(db, pattern, predicate=None, time_range=None):
+    """
+    Finds the models an atom occurs in at every timestep
+
+    Parameters
+    ----------
+    db : Connection
+        The index
+    pattern : str
+        Term of the atom, * matches any text, e.g. move(r1,*
+    predicate : str, optional
+        occurs, holds or None for both (default is None)
+    time_range : tuple, optional
+        First and last timestep or None for all (default is None)
+
+    Returns
+    -------
+    list
+        Predicate, term, timestep and the list of models for every match
+    """
+
+    sql, parameters = conditions(predicate, time_range)
+    rows = db.execute(
+        "SELECT atoms.predicate, symbols.name, atoms.timestep, atoms.model FROM symbols "
+        "JOIN atoms ON atoms.symbol = symbols.id WHERE symbols.name GLOB ?" + sql +
+        " ORDER BY atoms.predicate, symbols.name, atoms.timestep, atoms.model",
+        [pattern] + parameters
+    )
+
+    return [
+        (predicates[key[0]], key[1], key[2], [row[3] for row in group])
+        for key, group in groupby(rows, key=lambda row: row[:3])
+    ]
+
+def diff_models(db, first, second, predicate=None, time_range=None):
+    """
+    Finds the atoms that are only true in one of two models
+
+    Parameters
+    ----------
+    db : Connection
+        The index
+    first : int
+        Number of the first model
+    second : int
+        Number of the second model
+    predicate : str, optional
+        occurs, holds or None for both (default is None)
+    time_range : tuple, optional
+        First and last timestep or None for all (default is None)
+
+    Returns
+    -------
+    list
+        Timestep, predicate, term and the model the atom is true in, sorted by
+        timestep
+    """
+
+    sql, parameters = conditions(predicate, time_range)
+    only = (
+        "SELECT atoms.timestep AS timestep, atoms.predicate AS predicate, atoms.symbol AS symbol, ? AS model "
+        "FROM atoms WHERE atoms.model = ?" + sql +
+        " EXCEPT SELECT atoms.timestep, atoms.predicate, atoms.symbol, ? FROM atoms WHERE atoms.model = ?" + sql
+    )
+    rows = db.execute(
+        "SELECT difference.timestep, difference.predicate, symbols.name, difference.model FROM ("
+        + only + " UNION ALL " + only +
+        ") AS difference JOIN symbols ON symbols.id = difference.symbol "
+        "ORDER BY difference.timestep, difference.predicate, difference.model, symbols.name",
+        [first, first] + parameters + [first, second] + parameters +
+        [second, second] + parameters + [second, first] + parameters
+    )
+
+    return [(timestep, predicates[index], name, model) for timestep, index, name, model in rows]
+
+def main():
+    parser = ArgumentParser(description="Queries the atom index written by pretty-print.py --index")
+    parser.add_argument("index", metavar="INDEX")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--atom", metavar="PATTERN",
+        help="list the models an atom is true in per timestep, * matches any text, e.g. \"move(r1,*\"")
+    query.add_argument("--diff", type=int, nargs=2, metavar="MODEL", help="list the atoms that differ between two models")
+    parser.add_argument("--predicate", choices=predicates, help="only occurs or only holds atoms")
+    parser.add_argument("--time", type=parse_range, metavar="RANGE", help="only these timesteps, e.g. 5 or 40-60")
+    args = parser.parse_args()
+
+    if not isfile(args.index):
+        parser.error("index '%s' does not exist" % args.index)
+
+    db = connect(args.index)
+
+    try:
+        if args.atom is not None:
+            for predicate, name, timestep, models in find_atom(db, args.atom, args.predicate, args.time):
+                print("%s(%s,%d): %s" % (predicate, name, timestep, " ".join(str(model) for model in models)))
+        else:
+            first, second = args.diff
+
+            for timestep, predicate, name, model in diff_models(db, first, second, args.predicate, args.time):
+                print("%s %s(%s,%d)" % ("<" if model == first else ">", predicate, name, timestep))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()